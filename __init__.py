@@ -15,7 +15,13 @@ bl_info = {
 import bpy
 from bpy.types import AddonPreferences
 from .main import register as main_register, unregister as main_unregister
-from .stats import update_render_stats_handler, clear_render_log
+from .stats import update_render_stats_handler, clear_render_log, frame_started_handler, frame_written_handler, set_eta_method, set_log_retention, start_log_listener, stop_log_listener, close_frame_journal
+
+def update_eta_method(self, context):
+    set_eta_method(self.eta_method)
+
+def update_log_retention(self, context):
+    set_log_retention(self.log_max_lines, self.log_max_kb * 1024)
 
 class RenderStatsPreferences(AddonPreferences):
     bl_idname = __name__  # Must match addon's package name
@@ -26,27 +32,136 @@ class RenderStatsPreferences(AddonPreferences):
         default=False,
     )
 
+    use_background_server: bpy.props.BoolProperty(
+        name="Background Server Thread",
+        description="Serve requests from an event loop on its own thread instead of polling on Blender's main thread",
+        default=True,
+    )
+
+    listen_backlog: bpy.props.IntProperty(
+        name="Listen Backlog",
+        description="Maximum number of pending connections queued by the server socket",
+        default=5,
+        min=1,
+        max=1024,
+    )
+
+    keep_alive_timeout: bpy.props.FloatProperty(
+        name="Keep-Alive Timeout",
+        description="Seconds an idle persistent connection is kept open by the background server",
+        default=15.0,
+        min=1.0,
+        max=600.0,
+    )
+
+    max_keep_alive_requests: bpy.props.IntProperty(
+        name="Requests per Connection",
+        description="Maximum number of requests served on one persistent connection before it is closed",
+        default=100000,
+        min=1,
+    )
+
+    max_connections: bpy.props.IntProperty(
+        name="Max Connections",
+        description="Maximum number of simultaneous connections to the background server",
+        default=256,
+        min=1,
+    )
+
+    max_connections_per_ip: bpy.props.IntProperty(
+        name="Max Connections per IP",
+        description="Maximum number of simultaneous connections from one address",
+        default=64,
+        min=1,
+    )
+
+    requests_per_second: bpy.props.FloatProperty(
+        name="Requests per Second per IP",
+        description="Sustained request rate allowed from one address",
+        default=20.0,
+        min=0.1,
+    )
+
+    request_burst: bpy.props.IntProperty(
+        name="Request Burst per IP",
+        description="Number of requests one address may make at once before rate limiting applies",
+        default=100,
+        min=1,
+    )
+
+    eta_method: bpy.props.EnumProperty(
+        name="ETA Estimate",
+        description="How the expected remaining time is estimated from measured frame times",
+        items=[
+            ("ewma", "Recent Average", "Exponentially weighted average; follows gradual changes in frame time"),
+            ("median", "Rolling Median", "Median of recent frames; ignores one-off slow frames"),
+            ("trend", "Linear Trend", "Extrapolates frames getting steadily slower or faster"),
+        ],
+        default="ewma",
+        update=update_eta_method,
+    )
+
+    log_max_lines: bpy.props.IntProperty(
+        name="Log Lines Kept",
+        description="Maximum number of log lines kept for viewers; older lines are dropped",
+        default=1000,
+        min=10,
+        update=update_log_retention,
+    )
+
+    log_max_kb: bpy.props.IntProperty(
+        name="Log Size Kept (KB)",
+        description="Maximum size of the log kept for viewers; older lines are dropped",
+        default=256,
+        min=1,
+        update=update_log_retention,
+    )
+
     def draw(self, context):
         layout = self.layout
         layout.prop(self, "dependencies_activated", text="Dependencies Activated")
+        layout.prop(self, "use_background_server")
+        layout.prop(self, "listen_backlog")
+        layout.prop(self, "keep_alive_timeout")
+        layout.prop(self, "max_keep_alive_requests")
+        layout.prop(self, "max_connections")
+        layout.prop(self, "max_connections_per_ip")
+        layout.prop(self, "requests_per_second")
+        layout.prop(self, "request_burst")
+        layout.prop(self, "eta_method")
+        layout.prop(self, "log_max_lines")
+        layout.prop(self, "log_max_kb")
 
 def register_render_handlers():
+    if frame_started_handler not in bpy.app.handlers.render_pre:
+        bpy.app.handlers.render_pre.append(frame_started_handler)
+        print("Render pre handler registered.")
     if update_render_stats_handler not in bpy.app.handlers.render_post:
         bpy.app.handlers.render_post.append(update_render_stats_handler)
         print("Render post handler registered.")
     if clear_render_log not in bpy.app.handlers.render_init:
         bpy.app.handlers.render_init.append(clear_render_log)
         print("Render init handler registered.")
+    if frame_written_handler not in bpy.app.handlers.render_write:
+        bpy.app.handlers.render_write.append(frame_written_handler)
+        print("Render write handler registered.")
 
 def unregister_render_handlers():
+    if frame_started_handler in bpy.app.handlers.render_pre:
+        bpy.app.handlers.render_pre.remove(frame_started_handler)
+        print("Render pre handler unregistered.")
     if update_render_stats_handler in bpy.app.handlers.render_post:
         bpy.app.handlers.render_post.remove(update_render_stats_handler)
         print("Render post handler unregistered.")
     if clear_render_log in bpy.app.handlers.render_init:
         bpy.app.handlers.render_init.remove(clear_render_log)
         print("Render init handler unregistered.")
+    if frame_written_handler in bpy.app.handlers.render_write:
+        bpy.app.handlers.render_write.remove(frame_written_handler)
+        print("Render write handler unregistered.")
 
 def register():
+    start_log_listener()
     register_render_handlers()
     bpy.utils.register_class(RenderStatsPreferences)
     main_register()
@@ -56,6 +171,8 @@ def unregister():
     main_unregister()
     bpy.utils.unregister_class(RenderStatsPreferences)
     unregister_render_handlers()
+    close_frame_journal()
+    stop_log_listener()
     print("Render Stats Addon unregistered.")
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+# journal.py
+# Per-frame timing journal, kept next to the render output so a render that
+# dies at frame 8,000 of 12,000 keeps its history. Every frame of the range
+# has one fixed-size record slot in a memory-mapped file: the record is in
+# the page cache as soon as it is written, so it survives Blender crashing,
+# and msync every few seconds covers the machine going down too.
+#
+# Layout (little-endian, so the columns can be cast in place on x86 and ARM):
+#
+#   header, 64 bytes
+#        0    4 char[4]  magic, b"RSFJ"
+#        4    2 uint16   layout version (2)
+#        6    2 uint16   header size (64)
+#        8    2 uint16   record size (48)
+#       10    6          padding
+#       16    8 uint64   records, one per frame of the range
+#       24    8 int64    frame start of the render
+#       32    8 int64    frame end
+#       40    8 int64    frame step
+#       48   16          padding
+#
+#   record i at 64 + 48 * i, for frame start + i * step; six 8-byte fields
+#        0    8 int64    frame number
+#        8    8 int64    status: 0 not rendered, 1 started, 2 done
+#       16    8 float64  start, seconds since the epoch
+#       24    8 float64  end, seconds since the epoch (0 while started)
+#       32    8 float64  duration in seconds (0 while started)
+#       40    8 int64    peak resident memory of the process at the end, bytes
+#
+# A frame's record is (re)written at render_pre and completed in place at
+# render_post, so rendering a frame again replaces its record, and after a
+# crash the frame that was rendering shows as started.
+import mmap
+import os
+import struct
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+JOURNAL_NAME = ".render_stats_journal"
+MAGIC = b"RSFJ"
+LAYOUT_VERSION = 2
+HEADER = struct.Struct("<4sHHH6xQqqq")
+HEADER_SIZE = 64
+RECORD = struct.Struct("<qqdddq")
+FIELDS_PER_RECORD = 6
+STATUS_OFFSET = 8
+STATUS = struct.Struct("<q")
+
+FRAME_EMPTY = 0
+FRAME_STARTED = 1
+FRAME_DONE = 2
+
+# Seconds between msyncs while frames are being recorded.
+SYNC_INTERVAL = 5.0
+
+def peak_memory():
+    """Peak resident memory of this process in bytes; 0 where it is not available."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class FrameJournal:
+    """
+    One journal file, mapped for reading and writing. Only the render thread
+    uses it. Views from durations()/column() point straight into the map and
+    must be released before close().
+    """
+
+    def __init__(self, path, frame_start, frame_end, frame_step):
+        self.path = path
+        self.range = (frame_start, frame_end, frame_step)
+        step = max(1, frame_step)
+        self.slots = max(0, (frame_end - frame_start) // step + 1)
+        self.file = None
+        self.map = None
+        self.last_sync = time.monotonic()
+        self.open()
+
+    def open(self):
+        """Map the journal, continuing it if it belongs to the same unfinished render."""
+        self.file = open(self.path, "r+b" if os.path.exists(self.path) else "w+b")
+        self.file.seek(0, os.SEEK_END)
+        size = self.file.tell()
+        keep = False
+        if size >= HEADER_SIZE:
+            self.file.seek(0)
+            magic, layout, header_size, record_size, slots, start, end, step = \
+                HEADER.unpack(self.file.read(HEADER.size))
+            keep = (magic == MAGIC and layout == LAYOUT_VERSION and header_size == HEADER_SIZE
+                    and record_size == RECORD.size and (start, end, step) == self.range
+                    and slots == self.slots and size >= self.offset(self.slots))
+        if keep and self.finished():
+            keep = False
+        if not keep:
+            # A new render (or a foreign or damaged file): start over.
+            self.file.seek(0)
+            self.file.truncate(0)
+            self.file.write(HEADER.pack(MAGIC, LAYOUT_VERSION, HEADER_SIZE, RECORD.size,
+                                        self.slots, *self.range))
+            self.file.write(bytes(HEADER_SIZE - HEADER.size))
+            self.file.truncate(self.offset(self.slots))
+            self.file.flush()
+        self.map = mmap.mmap(self.file.fileno(), self.offset(self.slots))
+
+    def close(self):
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def offset(self, index):
+        return HEADER_SIZE + RECORD.size * index
+
+    def slot(self, frame):
+        """Record index of `frame`, or None if it is not a frame of the range."""
+        start, end, step = self.range
+        index, off = divmod(frame - start, max(1, step))
+        if off or not 0 <= index < self.slots:
+            return None
+        return index
+
+    def record(self, index):
+        """(frame, status, start, end, duration, peak memory) of record `index`."""
+        return RECORD.unpack_from(self.map, self.offset(index))
+
+    def finished(self):
+        """Whether the last frame of the range was rendered."""
+        if not self.slots:
+            return True
+        self.file.seek(self.offset(self.slots - 1))
+        status = RECORD.unpack(self.file.read(RECORD.size))[1]
+        return status == FRAME_DONE
+
+    def write(self, index, frame, status, start, end, duration, memory):
+        # The status goes in last, so a crash halfway leaves the record
+        # empty or started, never done with a torn duration.
+        offset = self.offset(index)
+        STATUS.pack_into(self.map, offset + STATUS_OFFSET, FRAME_EMPTY)
+        RECORD.pack_into(self.map, offset, frame, FRAME_EMPTY, start, end, duration, memory)
+        STATUS.pack_into(self.map, offset + STATUS_OFFSET, status)
+
+    def frame_started(self, frame, now=None):
+        """Mark `frame` as rendering, replacing any earlier record of it. Costs a few microseconds."""
+        index = self.slot(frame)
+        if index is None:
+            return
+        self.write(index, frame, FRAME_STARTED, time.time() if now is None else now, 0.0, 0.0, 0)
+        self.maybe_sync()
+
+    def frame_done(self, frame, duration, now=None):
+        """Complete the record of `frame`."""
+        index = self.slot(frame)
+        if index is None:
+            return
+        end = time.time() if now is None else now
+        self.write(index, frame, FRAME_DONE, end - duration, end, duration, peak_memory())
+        if index == self.slots - 1:
+            self.sync()
+        else:
+            self.maybe_sync()
+
+    def maybe_sync(self):
+        if time.monotonic() - self.last_sync >= SYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        self.last_sync = time.monotonic()
+        self.map.flush()
+
+    def column(self, field, typecode):
+        """
+        Zero-copy strided view of one field of every record, e.g.
+        column(4, "d") for durations. Release it before close().
+        """
+        data = memoryview(self.map)[HEADER_SIZE:self.offset(self.slots)]
+        return data.cast(typecode)[field::FIELDS_PER_RECORD]
+
+    def durations(self):
+        """(frames, statuses, durations) as zero-copy views over the journal."""
+        return self.column(0, "q"), self.column(1, "q"), self.column(4, "d")
@@ -0,0 +1,215 @@
+# logstore.py
+# Bounded store of log records. Each record gets the next sequence number,
+# so readers can ask for "everything after seq N" and get only the new lines.
+# Old records are dropped once either the line count or the byte budget is
+# exceeded; appends are O(1) amortized however verbose the log is.
+#
+# Records are kept in seq order with per-level and time indexes, so a query
+# for warnings in the last minute of a 50,000-line log touches only the
+# warnings, never the formatted text of everything else.
+import logging
+import threading
+from bisect import bisect_left
+from heapq import merge
+
+DEFAULT_MAX_LINES = 1000
+DEFAULT_MAX_BYTES = 256 * 1024
+# The "log" string in the stats snapshot keeps its historical size.
+LOG_TEXT_LIMIT = 10000
+DEFAULT_QUERY_LIMIT = 100
+
+class LogEntry:
+    __slots__ = ("seq", "created", "level", "logger", "message", "line", "size")
+
+    def __init__(self, seq, created, level, logger, message, line):
+        self.seq = seq
+        self.created = created  # time.time() when the record was logged
+        self.level = level      # logging level number
+        self.logger = logger
+        self.message = message
+        self.line = line        # formatted for display
+        self.size = len(line.encode("utf-8", "replace")) + 1
+
+    def to_dict(self):
+        return {"seq": self.seq, "time": self.created, "level": self.level,
+                "level_name": logging.getLevelName(self.level), "logger": self.logger,
+                "message": self.message, "line": self.line}
+
+class Column:
+    """
+    A list that is appended at the end and trimmed at the front. Trimming
+    moves a head offset and compacts occasionally, so both are O(1)
+    amortized and items keep O(1) indexing for bisect.
+    """
+    __slots__ = ("items", "head")
+
+    def __init__(self):
+        self.items = []
+        self.head = 0
+
+    def __len__(self):
+        return len(self.items) - self.head
+
+    def append(self, item):
+        self.items.append(item)
+
+    def popleft(self):
+        item = self.items[self.head]
+        self.head += 1
+        if self.head > 1024 and self.head * 2 > len(self.items):
+            del self.items[:self.head]
+            self.head = 0
+        return item
+
+    def first(self):
+        return self.items[self.head]
+
+    def newest_first(self, start):
+        """Items from index `start` of self.items to the end, newest first, without copying."""
+        items = self.items
+        return (items[i] for i in range(len(items) - 1, start - 1, -1))
+
+    def clear(self):
+        self.items = []
+        self.head = 0
+
+class LogStore:
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, max_bytes=DEFAULT_MAX_BYTES):
+        self.lock = threading.Lock()
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.entries = Column()  # LogEntry, oldest first; seqs are consecutive
+        self.times = Column()    # entry times, never decreasing, for bisect
+        self.levels = {}         # level number -> Column of seqs at that level
+        self.bytes = 0
+        # Sequence numbers keep counting across clears; epoch_seq is the last
+        # seq before the most recent clear.
+        self.seq = 0
+        self.epoch_seq = 0
+
+    def configure(self, max_lines=None, max_bytes=None):
+        """Change the retention limits; lines over the new limits go at once."""
+        with self.lock:
+            if max_lines is not None:
+                self.max_lines = max(1, max_lines)
+            if max_bytes is not None:
+                self.max_bytes = max(1, max_bytes)
+            self.trim()
+
+    def trim(self):
+        entries = self.entries
+        # The newest line is always kept, even if it alone is over budget.
+        while len(entries) > 1 and (len(entries) > self.max_lines or self.bytes > self.max_bytes):
+            entry = entries.popleft()
+            self.times.popleft()
+            self.levels[entry.level].popleft()
+            self.bytes -= entry.size
+
+    def append(self, created, level, logger, message, line):
+        """Store one record and return its sequence number."""
+        with self.lock:
+            self.seq += 1
+            entry = LogEntry(self.seq, created, level, logger, message, line)
+            # Threads can log slightly out of order; the index time never
+            # goes backwards so that it stays sorted.
+            if len(self.times):
+                created = max(created, self.times.items[-1])
+            self.entries.append(entry)
+            self.times.append(created)
+            column = self.levels.get(level)
+            if column is None:
+                column = self.levels[level] = Column()
+            column.append(self.seq)
+            self.bytes += entry.size
+            self.trim()
+            return self.seq
+
+    def clear(self):
+        """Drop every record; returns the current seq, which becomes the epoch."""
+        with self.lock:
+            self.entries.clear()
+            self.times.clear()
+            self.levels.clear()
+            self.bytes = 0
+            self.epoch_seq = self.seq
+            return self.seq
+
+    def since(self, since):
+        """
+        Return (lines, seq, reset): the lines appended after cursor `since`
+        and the cursor to pass next time. reset is True when the cursor
+        predates the retained window or the last clear, in which case lines
+        holds everything retained and the caller should discard what it has.
+        """
+        with self.lock:
+            seq = self.seq
+            entries = self.entries
+            oldest = entries.first().seq if len(entries) else seq + 1
+            if since <= self.epoch_seq or since > seq or since < oldest - 1:
+                start = entries.head
+                reset = True
+            else:
+                # Seqs are consecutive, so the cursor maps straight to an index.
+                start = entries.head + since - oldest + 1
+                reset = False
+            return [entry.line for entry in entries.items[start:]], seq, reset
+
+    def text(self, limit=LOG_TEXT_LIMIT, upto=None):
+        """
+        The newest whole lines, newline-terminated, within `limit` characters.
+        With `upto`, lines after that seq are left out, so the text is the
+        log as it stood when the store's seq was `upto`.
+        """
+        with self.lock:
+            lines = []
+            total = 0
+            items = self.entries.items
+            head = self.entries.head
+            last = len(items) - 1
+            if upto is not None and len(self.entries):
+                # Seqs are consecutive, so the cutoff maps straight to an index.
+                last = min(last, head + upto - items[head].seq)
+            for i in range(last, head - 1, -1):
+                line = items[i].line
+                total += len(line) + 1
+                if total > limit:
+                    break
+                lines.append(line)
+        lines.reverse()
+        return "".join(line + "\n" for line in lines)
+
+    def query(self, min_level=0, since_ts=None, contains=None, limit=DEFAULT_QUERY_LIMIT):
+        """
+        Return (entries, seq): the newest `limit` retained records at
+        `min_level` or above, logged at or after `since_ts` (a time.time()
+        value) and containing the text `contains` (ignoring case), oldest first.
+        """
+        with self.lock:
+            seq = self.seq
+            entries = self.entries
+            if not len(entries) or limit <= 0:
+                return [], seq
+            oldest = entries.first().seq
+            first_seq = oldest
+            if since_ts is not None:
+                i = bisect_left(self.times.items, since_ts, self.times.head)
+                first_seq = oldest + i - self.times.head
+            # Walk each wanted level's seqs newest first, merged into one
+            # descending stream; levels below min_level are never touched.
+            streams = []
+            for level, column in self.levels.items():
+                if level < min_level or not len(column):
+                    continue
+                start = bisect_left(column.items, first_seq, column.head)
+                streams.append(column.newest_first(start))
+            needle = contains.lower() if contains else None
+            found = []
+            for entry_seq in merge(*streams, reverse=True):
+                entry = entries.items[entries.head + entry_seq - oldest]
+                if needle and needle not in entry.message.lower():
+                    continue
+                found.append(entry)
+                if len(found) >= limit:
+                    break
+        found.reverse()
+        return found, seq
@@ -5,13 +5,11 @@ import os
 import sys
 import json
 import urllib.request
-import socket
 import select
 import platform
 import subprocess
 import shutil
 import time
-from urllib.parse import urlparse, parse_qs
 
 # Determine add-on directory and lib folder path
 addon_dir = os.path.dirname(__file__)
@@ -26,14 +24,28 @@ from bpy.types import Panel, Operator
 
 # Import our custom modules
 from .server import lowlevel_nat  # NAT mapping module using miniupnpc (from lib)
-from .stats import get_render_stats  # Returns current render stats (updated by our handlers)
+from .server.eventloop import EventLoopServer, create_listen_socket  # Background selectors server
+from .server.protocol import HEADER_END, FileResponse, StreamResponse, WaitResponse, build_response, parse_request
+from .server.limits import ServerLimits
+from .server.metrics import addon_metrics, server_metrics, timed
+from .server import thumbnail  # Latest-frame preview worker
+from .server.routes import handle_request, precheck_request_line, publish_log_line, publish_stats, publish_thumbnail
+from .stats import get_render_stats, set_eta_method, set_log_retention, add_stats_listener, remove_stats_listener, add_log_listener, remove_log_listener, add_frame_listener, remove_frame_listener  # Render stats (updated by our handlers)
 from .utils import get_access_key     # Returns a secure 16-character access key
 
 # Global variables
 server_started = False
 public_url = ""
 server_socket = None
+background_server = None
 SERVER_PORT = 8080
+DEFAULT_LISTEN_BACKLOG = 5
+DEFAULT_KEEP_ALIVE_TIMEOUT = 15.0
+DEFAULT_MAX_KEEP_ALIVE_REQUESTS = 100000
+DEFAULT_MAX_CONNECTIONS = 256
+DEFAULT_MAX_CONNECTIONS_PER_IP = 64
+DEFAULT_REQUESTS_PER_SECOND = 20.0
+DEFAULT_REQUEST_BURST = 100
 access_key = ""
 dependencies_activated = False  # Will be set via the dependency activation operator
 addon_preferences = None
@@ -59,6 +71,11 @@ def get_dot(status, for_server=False):
     else:
         return "STRIP_COLOR_04" if status else "STRIP_COLOR_01" # Green tick if true, Red cross if false
 
+def get_preference(name, default):
+    if addon_preferences is not None:
+        return getattr(addon_preferences, name, default)
+    return default
+
 def update_render_progress_data():
     return get_render_stats()
 
@@ -158,7 +175,7 @@ def remove_firewall_rule(port):
         print("Unsupported OS for firewall automation.")
 
 def start_server_once():
-    global server_started, public_url, server_socket, access_key, dependencies_activated, ipv6_enabled, start_server_error, server_connecting
+    global server_started, public_url, server_socket, background_server, access_key, dependencies_activated, ipv6_enabled, start_server_error, server_connecting
     start_server_error = ""
     if not dependencies_activated:
         print("Error: Dependencies not activated. Please click 'Activate Dependencies' first.")
@@ -202,17 +219,35 @@ def start_server_once():
 
     generate_qr_code(public_url)
 
+    backlog = get_preference("listen_backlog", DEFAULT_LISTEN_BACKLOG)
+    use_background = get_preference("use_background_server", True)
     try:
-        server_socket = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-        try:
-            server_socket.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
-        except Exception as e:
-            print("Could not disable IPv6-only mode:", e)
-        server_socket.setblocking(False)
-        server_socket.bind(('', SERVER_PORT))
-        server_socket.listen(5)
+        if use_background:
+            background_server = EventLoopServer(
+                serve_request, SERVER_PORT, backlog=backlog,
+                on_accept=mark_client_connected,
+                keep_alive_timeout=get_preference("keep_alive_timeout", DEFAULT_KEEP_ALIVE_TIMEOUT),
+                max_keep_alive_requests=get_preference("max_keep_alive_requests", DEFAULT_MAX_KEEP_ALIVE_REQUESTS),
+                limits=ServerLimits(
+                    max_connections=get_preference("max_connections", DEFAULT_MAX_CONNECTIONS),
+                    max_connections_per_ip=get_preference("max_connections_per_ip", DEFAULT_MAX_CONNECTIONS_PER_IP),
+                    requests_per_second=get_preference("requests_per_second", DEFAULT_REQUESTS_PER_SECOND),
+                    request_burst=get_preference("request_burst", DEFAULT_REQUEST_BURST),
+                ),
+                precheck=precheck_request,
+                metrics=server_metrics,
+            )
+            background_server.start()
+            add_stats_listener(push_stats_update)
+            add_log_listener(push_log_line)
+            thumbnail.add_thumbnail_listener(push_thumbnail)
+        else:
+            server_socket = create_listen_socket(SERVER_PORT, backlog)
+        thumbnail.start()
+        add_frame_listener(thumbnail.submit)
     except Exception as e:
         print("Error setting up server socket:", e)
+        background_server = None
         server_connecting = False
         return
 
@@ -220,8 +255,38 @@ def start_server_once():
     client_connected = False
     server_started = True
     server_connecting = False
-    bpy.app.timers.register(process_requests)
+    if not use_background:
+        bpy.app.timers.register(process_requests)
+
+def serve_request(request):
+    return handle_request(request, access_key)
+
+def precheck_request(request_line):
+    return precheck_request_line(request_line, access_key)
+
+def push_stats_update(stats):
+    # Runs on the render thread: only queue the work, the server thread encodes and sends.
+    server = background_server
+    if server is not None:
+        server.call_soon(publish_stats, server, stats)
+
+def push_log_line(seq, line):
+    server = background_server
+    if server is not None:
+        server.call_soon(publish_log_line, server, seq, line)
+
+def push_thumbnail(version, data):
+    # Runs on the thumbnail worker thread.
+    server = background_server
+    if server is not None:
+        server.call_soon(publish_thumbnail, server, version, data)
+
+def mark_client_connected(addr):
+    # Called from the background server thread; a plain flag write is enough for the panel.
+    global client_connected
+    client_connected = True
 
+@timed("process_requests")
 def process_requests():
     global server_socket, client_connected
     if server_socket is None:
@@ -245,189 +310,51 @@ def handle_client(conn, addr):
             if not data:
                 break
             request += data
-            if b"\r\n\r\n" in request:
+            if HEADER_END in request:
                 break
 
-        request_line = request.split(b"\r\n")[0].decode('utf-8')
-        parsed_url = urlparse(request_line.split(" ")[1])
-        qs = parse_qs(parsed_url.query)
-        received_key = qs.get("key", [None])[0]
-        if received_key != access_key:
-            response = ("HTTP/1.1 403 Forbidden\r\n"
-                        "Content-Type: text/plain\r\n"
-                        "Connection: close\r\n"
-                        "\r\nForbidden")
-            conn.sendall(response.encode('utf-8'))
+        try:
+            parsed_request = parse_request(request.split(HEADER_END)[0])
+        except ValueError:
+            conn.sendall(build_response(400, "Bad Request"))
             return
-
-        if request_line.startswith("GET /stats"):
-            stats = update_render_progress_data()
-            stats_json = json.dumps(stats)
-            response_body = stats_json.encode('utf-8')
-            response_header = (
-                "HTTP/1.1 200 OK\r\n"
-                "Content-Type: application/json\r\n"
-                f"Content-Length: {len(response_body)}\r\n"
-                "Connection: close\r\n"
-                "\r\n"
-            ).encode('utf-8')
-            conn.sendall(response_header + response_body)
+        # The main-thread fallback answers one request per connection; keep-alive,
+        # pipelining, streaming, held long-polls and file downloads are only
+        # offered by the background server, so a long-poll is answered at once
+        # here and a file (which could be a large EXR) is refused rather than
+        # sent while Blender's UI waits.
+        response = serve_request(parsed_request)
+        if isinstance(response, WaitResponse):
+            response = response.render()
+        if isinstance(response, StreamResponse):
+            conn.sendall(build_response(503, "Live updates require the background server"))
+        elif isinstance(response, FileResponse):
+            response.file.close()
+            conn.sendall(build_response(503, "Frame downloads require the background server"))
         else:
-            html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <title>Render Status</title>
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-            background-color: #000;
-            color: #fff;
-            margin: 0;
-            padding: 20px;
-        }}
-        #container {{
-            max-width: 600px;
-            width: 90%;
-            margin: auto;
-            background: #111;
-            padding: 20px;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(255,255,255,0.1);
-        }}
-        h1, h2 {{
-            text-align: center;
-            margin: 0.5em 0;
-        }}
-        .header-banner a {{
-            text-decoration: none;
-            color: inherit;
-        }}
-        .header-banner {{
-            text-align: center;
-            margin-bottom: 20px;
-        }}
-        .header-banner img {{
-            width: 80px;
-            height: auto;
-            display: block;
-            margin: 10px auto 0;
-        }}
-        .stat {{
-            margin: 10px 0;
-            font-size: 1.1em;
-        }}
-        #progressBarContainer {{
-            width: 100%;
-            background-color: #333;
-            border-radius: 5px;
-            margin: 10px 0;
-        }}
-        #progressBar {{
-            width: 0%;
-            height: 20px;
-            background-color: #4caf50;
-            border-radius: 5px;
-            text-align: center;
-            color: #000;
-            line-height: 20px;
-            font-size: 0.9em;
-        }}
-        #logconsole {{
-            background: #222;
-            padding: 10px;
-            border-radius: 4px;
-            font-family: monospace;
-            white-space: pre-wrap;
-            margin: 10px 0;
-            max-height: 200px;
-            overflow-y: auto;
-            border: 1px solid #444;
-        }}
-        @media screen and (max-width: 600px) {{
-            #container {{
-                padding: 15px;
-            }}
-            .stat {{
-                font-size: 1em;
-            }}
-            #progressBar {{
-                height: 18px;
-                line-height: 18px;
-                font-size: 0.8em;
-            }}
-            .header-banner img {{
-                width: 60px;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div id="container">
-        <div class="header-banner">
-            <a href="https://www.sedboi.com" target="_blank">
-                <h1>Made for creators by a creator</h1>
-                <img src="https://static.wixstatic.com/media/279b0c_aa034e8acd1e40ada17a82e7a6160c14~mv2.png" alt="Creator Logo">
-            </a>
-        </div>
-        <h1>Render Status</h1>
-        <div class="stat">Current Frame: <span id="current_frame"></span> / <span id="total_frames"></span></div>
-        <div id="progressBarContainer">
-            <div id="progressBar">0%</div>
-        </div>
-        <div class="stat">Last Frame Time: <span id="last_frame_time"></span> s</div>
-        <div class="stat">Total Expected Time: <span id="total_expected_time"></span> s</div>
-        <div class="stat">Render Active: <span id="render_active"></span></div>
-        <h2>Log Console</h2>
-        <div id="logconsole">Loading logs...</div>
-    </div>
-    <script>
-        function fetchStats() {{
-            fetch('/stats?key={access_key}')
-                .then(response => response.json())
-                .then(data => {{
-                    document.getElementById('current_frame').textContent = data.current_frame;
-                    document.getElementById('total_frames').textContent = data.total_frames;
-                    document.getElementById('last_frame_time').textContent = data.last_frame_time;
-                    document.getElementById('total_expected_time').textContent = data.total_expected_time;
-                    document.getElementById('render_active').textContent = data.render_active ? "Yes" : "No";
-                    let progress = data.progress_percentage || 0;
-                    let progressBar = document.getElementById('progressBar');
-                    progressBar.style.width = progress + '%';
-                    progressBar.textContent = progress.toFixed(2) + '%';
-                    document.getElementById('logconsole').textContent = data.log;
-                }})
-                .catch(error => console.error('Error fetching stats:', error));
-        }}
-        setInterval(fetchStats, 1000);
-        fetchStats();
-    </script>
-</body>
-</html>
-"""
-            response_body = html_content.encode('utf-8')
-            response_header = (
-                "HTTP/1.1 200 OK\r\n"
-                "Content-Type: text/html; charset=utf-8\r\n"
-                f"Content-Length: {len(response_body)}\r\n"
-                "Connection: close\r\n"
-                "\r\n"
-            ).encode('utf-8')
-            conn.sendall(response_header + response_body)
+            conn.sendall(response.encode())
     except Exception as e:
         print("Error handling client:", e)
     finally:
         conn.close()
 
 def stop_server():
-    global server_started, public_url, server_socket, client_connected, server_connecting
-    if server_started and server_socket:
-        try:
-            server_socket.close()
-            server_socket = None
-        except Exception as e:
-            print("Error closing server socket:", e)
+    global server_started, public_url, server_socket, background_server, client_connected, server_connecting
+    if server_started and (server_socket or background_server):
+        if background_server is not None:
+            remove_stats_listener(push_stats_update)
+            remove_log_listener(push_log_line)
+            thumbnail.remove_thumbnail_listener(push_thumbnail)
+            background_server.stop()
+            background_server = None
+        if server_socket is not None:
+            try:
+                server_socket.close()
+                server_socket = None
+            except Exception as e:
+                print("Error closing server socket:", e)
+        remove_frame_listener(thumbnail.submit)
+        thumbnail.stop()
         try:
             from .server.lowlevel_nat import RemoveMapping
             RemoveMapping(SERVER_PORT)
@@ -592,12 +519,35 @@ class RenderProgressPanel(Panel):
         layout.label(text=f"Total Frames: {stats.get('total_frames', 0)}")
         layout.label(text=f"Progress: {stats.get('progress_percentage', 0):.2f}%")
         layout.label(text=f"Last Frame Time: {stats.get('last_frame_time', 0):.2f} s")
-        layout.label(text=f"Total Expected Time: {stats.get('total_expected_time', 0):.2f} s")
+        layout.label(text=f"Frame Time: mean {stats.get('mean_frame_time', 0):.2f} s, "
+                          f"min {stats.get('min_frame_time', 0):.2f} s, max {stats.get('max_frame_time', 0):.2f} s")
+        layout.label(text=f"Rolling Mean: {stats.get('rolling_frame_time', 0):.2f} s")
+        layout.label(text=f"Remaining Frames: {stats.get('remaining_frames', 0)}")
+        layout.label(text=f"Total Expected Time: {stats.get('total_expected_time', 0):.2f} s "
+                          f"({stats.get('eta_low', 0):.0f}-{stats.get('eta_high', 0):.0f} s)")
         layout.label(text=f"Render Active: {'Yes' if stats.get('render_active', False) else 'No'}")
+        draw_addon_cost(layout)
         layout.separator()
         layout.label(text="Log Console:")
         layout.label(text=stats.get("log", ""), icon='TEXT')
 
+def draw_addon_cost(layout):
+    """What this addon costs Blender and what the server has handled, from the metrics counters."""
+    layout.separator()
+    layout.label(text=f"Addon Cost: {addon_metrics.cost_ms_per_second():.3f} ms/s "
+                      f"({addon_metrics.calls()} callbacks)")
+    if addon_metrics.log_records_dropped:
+        layout.label(text=f"Log Lines Dropped: {addon_metrics.log_records_dropped}", icon='ERROR')
+    if background_server is None:
+        return
+    latency = server_metrics.total_latency()
+    p50, p95 = latency.quantile(0.5), latency.quantile(0.95)
+    if p50 is not None:
+        layout.label(text=f"Requests: {latency.count}, p50 <= {p50 * 1000:g} ms, p95 <= {p95 * 1000:g} ms")
+    layout.label(text=f"Traffic: {server_metrics.bytes_received / 1024:.1f} KB in, "
+                      f"{server_metrics.bytes_sent / 1024:.1f} KB out")
+    layout.label(text=f"Syscalls: {server_metrics.recv_calls} recv, {server_metrics.send_calls} send")
+
 class ActivateDependenciesOperator(Operator):
     bl_idname = "finaltest.activate_dependencies"
     bl_label = "Activate Dependencies"
@@ -664,6 +614,8 @@ def register():
     atexit.register(stop_server)
     addon_preferences = bpy.context.preferences.addons[__package__].preferences
     dependencies_activated = addon_preferences.dependencies_activated
+    set_eta_method(addon_preferences.eta_method)
+    set_log_retention(addon_preferences.log_max_lines, addon_preferences.log_max_kb * 1024)
     print(f"Render Stats Addon registered with dependencies_activated = {dependencies_activated}")
 
 def unregister():
@@ -0,0 +1,53 @@
+# broadcast.py
+# Fan-out of streamed updates. Each message is encoded once by the caller and
+# wrapped in a single read-only memoryview; every subscriber queues that same
+# view and the event loop sends it from a per-connection offset, so N viewers
+# cost N references, not N copies.
+
+# A subscriber with more than this many bytes still unsent is "slow".
+MAX_SUBSCRIBER_BACKLOG = 256 * 1024
+
+class BroadcastHub:
+    def __init__(self, max_backlog=MAX_SUBSCRIBER_BACKLOG):
+        self.max_backlog = max_backlog
+        self.channels = {}  # channel name -> set of connections
+
+    def subscribe(self, channel, conn):
+        self.channels.setdefault(channel, set()).add(conn)
+
+    def unsubscribe(self, channel, conn):
+        subscribers = self.channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(conn)
+
+    def subscriber_count(self, channel):
+        return len(self.channels.get(channel, ()))
+
+    def publish(self, channel, data, key=None):
+        """
+        Queue `data` on every subscriber of `channel` and return
+        `(to_flush, to_drop)` lists of connections for the event loop.
+
+        Messages with a `key` describe state (e.g. the latest stats): if a
+        subscriber still has an unsent message with the same key it is replaced
+        in place, so slow viewers skip intermediate updates. Otherwise it is
+        queued even past the backlog limit, so no viewer is left on stale
+        state; that costs at most one extra message, as the next update
+        replaces it. Keyless messages (e.g. log lines) cannot be skipped, so
+        a subscriber too far behind to take one is dropped and will resync
+        when it reconnects.
+        """
+        to_flush, to_drop = [], []
+        subscribers = self.channels.get(channel)
+        if not subscribers:
+            return to_flush, to_drop
+        view = memoryview(data)  # bytes, so the view is read-only
+        for conn in subscribers:
+            if key is not None and conn.replace_queued(view, key):
+                continue
+            if key is None and conn.pending > self.max_backlog:
+                to_drop.append(conn)
+                continue
+            conn.queue(view, key)
+            to_flush.append(conn)
+        return to_flush, to_drop
@@ -0,0 +1,100 @@
+# compression.py
+# Accept-Encoding negotiation and a small cache of compressed bodies, so a
+# body shared by many viewers is compressed once rather than once per request.
+import threading
+import zlib
+from collections import OrderedDict
+
+MIN_COMPRESS_SIZE = 1024
+COMPRESS_LEVEL = 6
+CACHE_ENTRIES = 16
+
+# HTTP content-coding -> zlib wbits (gzip wrapper, or the zlib format HTTP calls "deflate").
+WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript")
+
+# (body, encoding) -> compressed body, least recently used first.
+cache = OrderedDict()
+cache_lock = threading.Lock()
+
+def negotiate(request):
+    """Pick gzip or deflate from Accept-Encoding, honouring q-values; None for identity."""
+    header = request.header("accept-encoding")
+    if not header:
+        return None
+    best, best_q = None, 0.0
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q <= 0:
+            continue
+        if coding == "*":
+            coding = "gzip"
+        # Prefer gzip on ties: it is what every browser sends first anyway.
+        if coding in WBITS and (q > best_q or (q == best_q and coding == "gzip")):
+            best, best_q = coding, q
+    return best
+
+def compress(body, encoding):
+    key = (body, encoding)
+    with cache_lock:
+        compressed = cache.get(key)
+        if compressed is not None:
+            cache.move_to_end(key)
+            return compressed
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, WBITS[encoding])
+    compressed = compressor.compress(body) + compressor.flush()
+    with cache_lock:
+        cache[key] = compressed
+        if len(cache) > CACHE_ENTRIES:
+            cache.popitem(last=False)
+    return compressed
+
+def encoded_etag(etag, encoding):
+    # Each representation needs its own strong validator.
+    return f'{etag[:-1]}-{encoding}"'
+
+def tag_encoding(response, encoding):
+    for i, (name, value) in enumerate(response.headers):
+        if name == "ETag" and value.endswith('"'):
+            response.headers[i] = (name, encoded_etag(value, encoding))
+
+def client_has_encoded(request, response, encoding):
+    """Whether If-None-Match names the `encoding` variant of the response's ETag."""
+    header = request.header("if-none-match", "")
+    tags = [tag.strip() for tag in header.split(",")]
+    return any(name == "ETag" and value.endswith('"') and encoded_etag(value, encoding) in tags
+               for name, value in response.headers)
+
+def compress_response(request, response):
+    """
+    Compress `response` in place when the client accepts it and the body is
+    large enough to be worth it. Adds `Vary: Accept-Encoding` to anything
+    compressible so shared caches keep the variants apart. A 304 (built with
+    the content type of the body it stands for) gets the same Vary, and the
+    encoded ETag when that is the variant the client revalidated.
+    """
+    if response.status not in (200, 304) or not response.content_type.startswith(COMPRESSIBLE_TYPES):
+        return response
+    response.headers.append(("Vary", "Accept-Encoding"))
+    encoding = negotiate(request)
+    if encoding is None:
+        return response
+    if response.status == 304:
+        if client_has_encoded(request, response, encoding):
+            tag_encoding(response, encoding)
+        return response
+    if len(response.body) < MIN_COMPRESS_SIZE:
+        return response
+    response.body = compress(response.body, encoding)
+    response.headers.append(("Content-Encoding", encoding))
+    tag_encoding(response, encoding)
+    return response
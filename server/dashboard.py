@@ -0,0 +1,146 @@
+# dashboard.py
+# The HTML dashboard and its static assets. The page is rendered once per
+# access key and kept as bytes with a strong ETag; the stylesheet, script and
+# logo are served from memory under content-hashed URLs so browsers can cache
+# them indefinitely and never need an external fetch.
+import hashlib
+import html
+import os
+import threading
+import urllib.request
+
+from .protocol import Response, etag_matches
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache")
+LOGO_URL = "https://static.wixstatic.com/media/279b0c_aa034e8acd1e40ada17a82e7a6160c14~mv2.png"
+LOGO_CACHE_PATH = os.path.join(CACHE_DIR, "logo.png")
+
+PAGE_CACHE_CONTROL = "no-cache"
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class Asset:
+    def __init__(self, name, data, content_type):
+        digest = hashlib.sha1(data).hexdigest()
+        stem, ext = os.path.splitext(name)
+        self.url = f"/assets/{stem}-{digest[:12]}{ext}"
+        self.etag = f'"{digest}"'
+        self.data = data
+        self.content_type = content_type
+
+def make_etag(data):
+    return f'"{hashlib.sha1(data).hexdigest()}"'
+
+def load_static(name, content_type):
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        return Asset(name, f.read(), content_type)
+
+stylesheet = load_static("dashboard.css", "text/css; charset=utf-8")
+script = load_static("dashboard.js", "application/javascript; charset=utf-8")
+logo = None
+logo_fetch_started = False
+
+# url -> Asset for everything servable under /assets/.
+assets = {stylesheet.url: stylesheet, script.url: script}
+# access key -> (body bytes, etag). Cleared whenever an asset URL changes.
+page_cache = {}
+
+def register_logo(data):
+    global logo
+    logo = Asset("logo.png", data, "image/png")
+    assets[logo.url] = logo
+    page_cache.clear()
+
+def fetch_logo():
+    try:
+        with urllib.request.urlopen(LOGO_URL, timeout=10) as response:
+            data = response.read()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(LOGO_CACHE_PATH, "wb") as f:
+            f.write(data)
+    except Exception as e:
+        print("Could not fetch dashboard logo:", e)
+        return
+    register_logo(data)
+
+def ensure_logo():
+    """Load the logo from the local cache, or download it once in the background."""
+    global logo_fetch_started
+    if logo is not None or logo_fetch_started:
+        return
+    logo_fetch_started = True
+    if os.path.exists(LOGO_CACHE_PATH):
+        try:
+            with open(LOGO_CACHE_PATH, "rb") as f:
+                register_logo(f.read())
+            return
+        except OSError as e:
+            print("Could not read cached logo:", e)
+    threading.Thread(target=fetch_logo, name="RenderStatsLogoFetch", daemon=True).start()
+
+def render_page(access_key):
+    logo_html = ""
+    if logo is not None:
+        logo_html = f'\n                <img src="{logo.url}" alt="Creator Logo">'
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Render Status</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <link rel="stylesheet" href="{stylesheet.url}">
+</head>
+<body data-key="{html.escape(access_key)}">
+    <div id="container">
+        <div class="header-banner">
+            <a href="https://www.sedboi.com" target="_blank">
+                <h1>Made for creators by a creator</h1>{logo_html}
+            </a>
+        </div>
+        <h1>Render Status</h1>
+        <div class="stat">Current Frame: <span id="current_frame"></span> / <span id="total_frames"></span></div>
+        <div id="progressBarContainer">
+            <div id="progressBar">0%</div>
+        </div>
+        <div class="stat">Last Frame Time: <span id="last_frame_time"></span> s</div>
+        <div class="stat">Total Expected Time: <span id="total_expected_time"></span> s</div>
+        <div class="stat">Render Active: <span id="render_active"></span></div>
+        <div class="stat">Latest Frame: <a id="output_file" target="_blank"></a></div>
+        <img id="thumbnail" alt="Latest frame preview" hidden>
+        <h2>Log Console</h2>
+        <div class="stat">
+            <select id="loglevel">
+                <option value="">All messages</option>
+                <option value="warning">Warnings and errors</option>
+                <option value="error">Errors only</option>
+            </select>
+            <label><input type="checkbox" id="loglastminute"> Last minute only</label>
+        </div>
+        <div id="logconsole">Loading logs...</div>
+    </div>
+    <script src="{script.url}"></script>
+</body>
+</html>
+"""
+
+def page_response(request, access_key):
+    ensure_logo()
+    cached = page_cache.get(access_key)
+    if cached is None:
+        body = render_page(access_key).encode("utf-8")
+        cached = (body, make_etag(body))
+        page_cache[access_key] = cached
+    body, etag = cached
+    headers = [("ETag", etag), ("Cache-Control", PAGE_CACHE_CONTROL)]
+    if etag_matches(request, etag):
+        return Response(304, content_type="text/html; charset=utf-8", headers=headers)
+    return Response(200, body, "text/html; charset=utf-8", headers)
+
+def asset_response(request):
+    asset = assets.get(request.path)
+    if asset is None:
+        return Response(404, "Not Found")
+    headers = [("ETag", asset.etag), ("Cache-Control", ASSET_CACHE_CONTROL)]
+    if etag_matches(request, asset.etag):
+        return Response(304, content_type=asset.content_type, headers=headers)
+    return Response(200, asset.data, asset.content_type, headers)
@@ -0,0 +1,563 @@
+# eventloop.py
+# Background HTTP server: a selectors event loop running on its own daemon
+# thread. Every socket is non-blocking, so a slow client only ever costs the
+# loop a failed recv/send, and Blender's main thread does no socket work.
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from .broadcast import BroadcastHub
+from .limits import REJECT_BUSY, REJECT_RATE, RateLimiter, ServerLimits
+from .protocol import HEADER_END, FileResponse, Response, StreamResponse, WaitResponse, parse_request
+
+RECV_SIZE = 4096
+SELECT_TIMEOUT = 0.5
+# Stop parsing pipelined requests while this much output is still unsent.
+MAX_PENDING_OUTPUT = 256 * 1024
+# Buffers handed to one sendmsg call; sendmsg is unavailable on Windows.
+MAX_SEND_BUFFERS = 64
+HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+# Most bytes handed to one sendfile call, so one large download cannot hog the loop.
+SENDFILE_CHUNK = 1024 * 1024
+HAS_SENDFILE = hasattr(os, "sendfile")
+
+class FileSegment:
+    """
+    `length` bytes of an open file from `offset`, queued like a buffer. Sent
+    with os.sendfile where the platform has it, else in chunks read on the
+    server thread.
+    """
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def send(self, sock, position):
+        count = min(self.length - position, SENDFILE_CHUNK)
+        if HAS_SENDFILE:
+            sent = os.sendfile(sock.fileno(), self.file.fileno(), self.offset + position, count)
+        else:
+            self.file.seek(self.offset + position)
+            data = self.file.read(count)
+            sent = sock.send(data) if data else 0
+        if sent == 0:
+            # The socket was writable, so the file must have shrunk under us.
+            raise OSError("file truncated while sending")
+        return sent
+
+    def close(self):
+        try:
+            self.file.close()
+        except OSError:
+            pass
+
+class Connection:
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.ip = addr[0]
+        self.inbuf = bytearray()
+        # Outgoing [memoryview or FileSegment, key] entries; the head is sent
+        # from out_offset. Broadcast messages share one view across all subscribers.
+        self.outq = deque()
+        self.out_offset = 0
+        self.pending = 0
+        # Running byte totals; completions holds (queued total at the end of a
+        # response, route, start time) so latency is taken at its last byte.
+        self.queued_total = 0
+        self.sent_total = 0
+        self.completions = deque()
+        self.closing = False
+        self.requests_served = 0
+        self.accepted = self.last_active = time.monotonic()
+        self.stream = None  # StreamResponse once the connection is subscribed
+        self.waiting = None  # (WaitResponse, keep_alive, deadline, path, started) while held
+        self.request_started = None  # when the first byte of the pending request arrived
+        self.prechecked = False  # pending request line already rate-limited and prechecked
+
+    def queue(self, data, key=None):
+        if data:
+            view = data if isinstance(data, memoryview) else memoryview(data)
+            self.outq.append([view, key])
+            self.pending += len(view)
+            self.queued_total += len(view)
+
+    def queue_file(self, file, offset, length):
+        if length:
+            self.outq.append([FileSegment(file, offset, length), None])
+            self.pending += length
+            self.queued_total += length
+        else:
+            file.close()
+
+    def replace_queued(self, view, key):
+        """Swap an unsent message with the same key for `view`; False if there is none."""
+        for index, entry in enumerate(self.outq):
+            if entry[1] == key and not (index == 0 and self.out_offset):
+                self.pending += len(view) - len(entry[0])
+                self.queued_total += len(view) - len(entry[0])
+                entry[0] = view
+                return True
+        return False
+
+    def send(self):
+        """Send as much queued output as the socket takes; returns bytes sent."""
+        head = self.outq[0][0]
+        if isinstance(head, FileSegment):
+            sent = head.send(self.sock, self.out_offset)
+        elif HAS_SENDMSG and len(self.outq) > 1:
+            buffers = [head[self.out_offset:]]
+            for data, _ in islice(self.outq, 1, MAX_SEND_BUFFERS):
+                if isinstance(data, FileSegment):
+                    break
+                buffers.append(data)
+            sent = self.sock.sendmsg(buffers)
+        else:
+            sent = self.sock.send(head[self.out_offset:])
+        self.pending -= sent
+        self.sent_total += sent
+        remaining = sent
+        while remaining:
+            left = len(self.outq[0][0]) - self.out_offset
+            if remaining < left:
+                self.out_offset += remaining
+                break
+            remaining -= left
+            finished = self.outq.popleft()[0]
+            if isinstance(finished, FileSegment):
+                finished.close()
+            self.out_offset = 0
+        return sent
+
+    def discard_output(self):
+        for data, _ in self.outq:
+            if isinstance(data, FileSegment):
+                data.close()
+        self.outq.clear()
+        self.out_offset = 0
+        self.pending = 0
+
+class EventLoopServer:
+    """
+    Serves `app(request) -> Response` from a daemon thread.
+    `on_accept(addr)` is called from the server thread for every new client.
+    Connections are kept alive for up to `keep_alive_timeout` idle seconds and
+    `max_keep_alive_requests` requests; pipelined requests are answered in order.
+    Streaming responses get `heartbeat` bytes after `heartbeat_interval` idle seconds,
+    and held (long-poll) requests are completed by `notify` or their timeout.
+    `limits` (a ServerLimits) caps connections, request rates and sizes;
+    `precheck(request_line)` may return a Response to reject a request before
+    its headers have even arrived. `metrics` (a ServerMetrics), if given,
+    counts responses, bytes sent, connections and handler time.
+    """
+
+    def __init__(self, app, port, backlog=5, on_accept=None,
+                 keep_alive_timeout=15.0, max_keep_alive_requests=100000,
+                 heartbeat_interval=15.0, limits=None, precheck=None, metrics=None):
+        self.app = app
+        self.metrics = metrics
+        self.limits = limits or ServerLimits()
+        self.precheck = precheck
+        self.rate_limiter = RateLimiter(self.limits.requests_per_second, self.limits.request_burst)
+        self.connections_per_ip = {}
+        self.port = port
+        self.backlog = backlog
+        self.on_accept = on_accept
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
+        self.heartbeat_interval = heartbeat_interval
+        self.listen_socket = None
+        self.selector = None
+        self.thread = None
+        self.running = False
+        self.connections = {}
+        self.hub = BroadcastHub()
+        self.waiters = {}
+        self.callbacks = deque()
+        self.wakeup_reader = None
+        self.wakeup_writer = None
+
+    def start(self):
+        self.listen_socket = create_listen_socket(self.port, self.backlog)
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listen_socket, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="RenderStatsServer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wakeup()
+        if self.thread is not None:
+            self.thread.join(timeout=SELECT_TIMEOUT * 4)
+            self.thread = None
+
+    def call_soon(self, callback, *args):
+        """Run `callback(*args)` on the server thread. Safe to call from any thread."""
+        self.callbacks.append((callback, args))
+        self._wakeup()
+
+    def publish(self, channel, data, key=None):
+        """
+        Send `data` to every connection streaming `channel` without copying it
+        per subscriber; see BroadcastHub.publish for how slow subscribers and
+        `key` are handled. Must run on the server thread (use call_soon from
+        elsewhere).
+        """
+        to_flush, to_drop = self.hub.publish(channel, data, key)
+        for conn in to_drop:
+            self._close(conn)
+        for conn in to_flush:
+            self._write(conn)
+
+    def notify(self, channel):
+        """Complete every held request on `channel` that is now ready. Server thread only."""
+        for conn in list(self.waiters.get(channel, ())):
+            if conn.waiting[0].ready():
+                self._finish_wait(conn)
+
+    def _wakeup(self):
+        try:
+            self.wakeup_writer.send(b"\0")
+        except (OSError, AttributeError):
+            pass  # a wakeup is already pending, or the server is not running
+
+    def _run_callbacks(self):
+        try:
+            while self.wakeup_reader.recv(RECV_SIZE):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self.callbacks:
+            callback, args = self.callbacks.popleft()
+            try:
+                callback(*args)
+            except Exception as e:
+                print("Error in server callback:", e)
+
+    def _run(self):
+        try:
+            while self.running:
+                for key, mask in self.selector.select(SELECT_TIMEOUT):
+                    if key.fileobj is self.listen_socket:
+                        self._accept()
+                        continue
+                    if key.fileobj is self.wakeup_reader:
+                        self._run_callbacks()
+                        continue
+                    conn = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._read(conn)
+                    if mask & selectors.EVENT_WRITE and conn.sock in self.connections:
+                        self._write(conn)
+                self._tick()
+        except Exception as e:
+            print("Error in server loop:", e)
+        finally:
+            self._shutdown()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, addr = self.listen_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print("Error accepting connection:", e)
+                return
+            ip = addr[0]
+            if (len(self.connections) >= self.limits.max_connections
+                    or self.connections_per_ip.get(ip, 0) >= self.limits.max_connections_per_ip):
+                reject(sock, REJECT_BUSY)
+                continue
+            if not self.rate_limiter.has_tokens(ip):
+                reject(sock, REJECT_RATE)
+                continue
+            sock.setblocking(False)
+            conn = Connection(sock, addr)
+            self.connections[sock] = conn
+            self.connections_per_ip[ip] = self.connections_per_ip.get(ip, 0) + 1
+            if self.metrics is not None:
+                self.metrics.active_connections = len(self.connections)
+            self.selector.register(sock, selectors.EVENT_READ, conn)
+            if self.on_accept is not None:
+                self.on_accept(addr)
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close(conn)
+            return
+        if self.metrics is not None:
+            self.metrics.recv_calls += 1
+            self.metrics.bytes_received += len(data)
+        if not data:
+            self._close(conn)
+            return
+        conn.last_active = time.monotonic()
+        if conn.closing:
+            return
+        if len(conn.inbuf) + len(data) > self.limits.max_input_size:
+            # Nothing consumes input while a long-poll is held or output is
+            # backed up, so cap what one connection may buffer meanwhile.
+            self._close(conn)
+            return
+        if conn.stream is not None:
+            if conn.stream.reader is not None:
+                conn.inbuf += data
+                reply, close = conn.stream.reader(conn.inbuf)
+                conn.queue(reply)
+                if close:
+                    conn.closing = True
+                    self.hub.unsubscribe(conn.stream.channel, conn)
+                self._write(conn)
+            return
+        conn.inbuf += data
+        self._process(conn)
+        self._write(conn)
+
+    def _process(self, conn):
+        """Answer every complete request in the input buffer, in order."""
+        limits = self.limits
+        while (not conn.closing and conn.stream is None and conn.waiting is None
+               and conn.pending < MAX_PENDING_OUTPUT):
+            if not conn.inbuf:
+                return
+            if conn.request_started is None:
+                conn.request_started = time.monotonic()
+            if not conn.prechecked:
+                # Early reject on the request line alone, before reading headers.
+                line_end = conn.inbuf.find(b"\r\n")
+                if line_end < 0:
+                    if len(conn.inbuf) > limits.max_header_size:
+                        self._queue(conn, Response(431, "Request Header Fields Too Large"), False)
+                    return
+                if not self.rate_limiter.consume(conn.ip):
+                    self._queue(conn, Response(429, "Too Many Requests", headers=[("Retry-After", "1")]), False)
+                    return
+                if self.precheck is not None:
+                    rejection = self.precheck(bytes(conn.inbuf[:line_end]))
+                    if rejection is not None:
+                        self._queue(conn, rejection, False)
+                        return
+                conn.prechecked = True
+            end = conn.inbuf.find(HEADER_END)
+            if end < 0:
+                if len(conn.inbuf) > limits.max_header_size:
+                    self._queue(conn, Response(431, "Request Header Fields Too Large"), False)
+                return
+            try:
+                request = parse_request(bytes(conn.inbuf[:end]))
+            except ValueError:
+                self._queue(conn, Response(400, "Bad Request"), False)
+                return
+            if request.content_length > limits.max_body_size:
+                self._queue(conn, Response(413, "Payload Too Large"), False)
+                return
+            consumed = end + len(HEADER_END) + request.content_length
+            if len(conn.inbuf) < consumed:
+                return  # request body still arriving
+            del conn.inbuf[:consumed]
+            # A connection's first request is timed from accept, later ones
+            # from their first byte.
+            request_started = conn.request_started if conn.requests_served else conn.accepted
+            conn.request_started = None
+            conn.prechecked = False
+            started = time.perf_counter()
+            try:
+                response = self.app(request)
+            except Exception as e:
+                print("Error handling client:", e)
+                response = Response(500, "Internal Server Error")
+            if self.metrics is not None:
+                self.metrics.handler_seconds.observe(time.perf_counter() - started)
+            conn.requests_served += 1
+            keep_alive = (request.wants_keep_alive
+                          and conn.requests_served < self.max_keep_alive_requests)
+            self._queue(conn, response, keep_alive, request.path, request_started)
+
+    def _queue(self, conn, response, keep_alive, path=None, started=None):
+        """
+        Queue `response`. `path` and `started` describe the request; both are
+        None for early rejects.
+        """
+        if isinstance(response, WaitResponse):
+            if not response.ready():
+                deadline = time.monotonic() + response.timeout
+                conn.waiting = (response, keep_alive, deadline, path, started)
+                self.waiters.setdefault(response.channel, set()).add(conn)
+                return
+            response = self._render(response)
+        route = None
+        if self.metrics is not None:
+            route = self.metrics.count_response(path, response.status)
+        if isinstance(response, StreamResponse):
+            conn.queue(response.encode_head())
+            conn.stream = response
+            self.hub.subscribe(response.channel, conn)
+            return
+        header = None
+        if keep_alive:
+            remaining = self.max_keep_alive_requests - conn.requests_served
+            header = f"timeout={int(self.keep_alive_timeout)}, max={remaining}"
+        else:
+            conn.closing = True
+        if isinstance(response, FileResponse):
+            conn.queue(response.encode_head(keep_alive, header))
+            conn.queue_file(response.file, response.offset, response.length)
+        else:
+            conn.queue(response.encode(keep_alive, header))
+        if route is not None:
+            if started is None:
+                started = conn.request_started or conn.accepted
+            conn.completions.append((conn.queued_total, route, started))
+
+    def _render(self, response):
+        try:
+            return response.render()
+        except Exception as e:
+            print("Error handling client:", e)
+            return Response(500, "Internal Server Error")
+
+    def _finish_wait(self, conn):
+        response, keep_alive, _, path, started = conn.waiting
+        conn.waiting = None
+        self.waiters.get(response.channel, set()).discard(conn)
+        self._queue(conn, self._render(response), keep_alive, path, started)
+        self._process(conn)
+        self._write(conn)
+
+    def _write(self, conn):
+        if conn.outq:
+            try:
+                sent = conn.send()
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                self._close(conn)
+                return
+            if self.metrics is not None:
+                self.metrics.send_calls += 1
+            if sent:
+                conn.last_active = time.monotonic()
+                if self.metrics is not None:
+                    self.metrics.bytes_sent += sent
+                    self._complete(conn, conn.last_active)
+        if not conn.outq:
+            if conn.closing:
+                self._close(conn)
+                return
+            if conn.inbuf and conn.stream is None and conn.waiting is None:
+                # Pipelined requests held back by MAX_PENDING_OUTPUT.
+                self._process(conn)
+                if conn.outq:
+                    self._write(conn)
+                    return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if conn.outq else 0)
+        self.selector.modify(conn.sock, events, conn)
+
+    def _complete(self, conn, now):
+        """Record latency for every response whose last byte has now been sent."""
+        completions = conn.completions
+        while completions and completions[0][0] <= conn.sent_total:
+            _, route, started = completions.popleft()
+            self.metrics.observe_latency(route, now - started)
+
+    def _tick(self):
+        now = time.monotonic()
+        idle_deadline = now - self.keep_alive_timeout
+        heartbeat_deadline = now - self.heartbeat_interval
+        header_deadline = now - self.limits.header_timeout
+        write_deadline = now - self.limits.write_timeout
+        self.rate_limiter.prune()
+        for conn in list(self.connections.values()):
+            if conn.outq and conn.last_active < write_deadline:
+                self._close(conn)  # client stopped reading
+            elif conn.stream is not None:
+                if conn.stream.heartbeat and conn.last_active < heartbeat_deadline and not conn.outq:
+                    conn.queue(conn.stream.heartbeat)
+                    self._write(conn)
+            elif conn.waiting is not None:
+                if conn.waiting[2] < now:
+                    self._finish_wait(conn)
+            elif conn.request_started is not None and conn.request_started < header_deadline:
+                if not conn.outq and not conn.closing:
+                    self._queue(conn, Response(408, "Request Timeout"), False)
+                    self._write(conn)
+            elif conn.last_active < idle_deadline and not conn.outq:
+                self._close(conn)
+
+    def _close(self, conn):
+        if self.connections.pop(conn.sock, None) is None:
+            return
+        remaining = self.connections_per_ip.get(conn.ip, 1) - 1
+        if remaining > 0:
+            self.connections_per_ip[conn.ip] = remaining
+        else:
+            self.connections_per_ip.pop(conn.ip, None)
+        if self.metrics is not None:
+            self.metrics.active_connections = len(self.connections)
+        if conn.stream is not None:
+            self.hub.unsubscribe(conn.stream.channel, conn)
+        if conn.waiting is not None:
+            self.waiters.get(conn.waiting[0].channel, set()).discard(conn)
+        conn.discard_output()
+        try:
+            self.selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        conn.sock.close()
+
+    def _shutdown(self):
+        for conn in list(self.connections.values()):
+            self._close(conn)
+        try:
+            self.selector.close()
+        except Exception:
+            pass
+        for sock in (self.wakeup_reader, self.wakeup_writer):
+            sock.close()
+        try:
+            self.listen_socket.close()
+        except Exception as e:
+            print("Error closing server socket:", e)
+
+def reject(sock, response):
+    """Best-effort canned response on a freshly accepted socket, then close it."""
+    try:
+        sock.setblocking(False)
+        sock.send(response)
+    except OSError:
+        pass
+    sock.close()
+
+def create_listen_socket(port, backlog):
+    """Dual-stack IPv6 listening socket, matching the addon's IPv6-first setup."""
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+    except Exception as e:
+        print("Could not disable IPv6-only mode:", e)
+    if sys.platform != "win32":
+        # Allow restarting the server while old keep-alive sockets sit in TIME_WAIT.
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setblocking(False)
+    sock.bind(('', port))
+    sock.listen(backlog)
+    return sock
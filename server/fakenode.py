@@ -0,0 +1,88 @@
+# fakenode.py
+# Stand-in render nodes for trying the fleet hub without Blender. Each fake
+# node serves /stats, /stats?lean=1 and /stats.bin like the real addon, for a
+# render that advances with wall-clock time:
+#
+#     python -m server.fakenode --count 8 --port 8081 > nodes.txt
+#     python -m server.hub --nodes-file nodes.txt
+#
+# --flaky makes a share of requests fail with 503 so backoff can be watched.
+import argparse
+import json
+import random
+import secrets
+import time
+
+from . import statsbin
+from .eventloop import EventLoopServer
+from .protocol import Response, etag_matches
+
+class FakeNode:
+    def __init__(self, key, frames=250, frame_time=2.0, jitter=0.3, flaky=0.0):
+        self.key = key
+        self.frames = frames
+        self.frame_time = frame_time * random.uniform(1 - jitter, 1 + jitter)
+        self.flaky = flaky
+        self.started = time.monotonic()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        current = min(self.frames, int(elapsed / self.frame_time))
+        return {
+            "current_frame": current,
+            "total_frames": self.frames,
+            "progress_percentage": current / self.frames * 100,
+            "remaining_frames": self.frames - current,
+            "frames_in_range": self.frames,
+            "last_frame_time": self.frame_time,
+            "total_expected_time": (self.frames - current) * self.frame_time,
+            "render_active": current < self.frames,
+            "version": current,
+        }
+
+    def app(self, request):
+        if request.arg("key") != self.key:
+            return Response(403, "Forbidden")
+        if self.flaky and random.random() < self.flaky:
+            return Response(503, "Service Unavailable")
+        stats = self.stats()
+        if request.path == "/stats.bin":
+            body, content_type = statsbin.encode_stats(stats), statsbin.CONTENT_TYPE
+        elif request.path == "/stats":
+            if request.arg("lean") != "1":
+                stats["log"] = ""
+            body, content_type = json.dumps(stats).encode("utf-8"), "application/json"
+        else:
+            return Response(404, "Not Found")
+        etag = f'"fake-{request.path}-{stats["version"]}"'
+        headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+        if etag_matches(request, etag):
+            return Response(304, headers=headers)
+        return Response(200, body, content_type, headers)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Render-Stats nodes for testing the hub.")
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8081, help="first port; nodes use consecutive ports")
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--frame-time", type=float, default=2.0)
+    parser.add_argument("--flaky", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args(argv)
+    servers = []
+    for i in range(args.count):
+        node = FakeNode(secrets.token_urlsafe(12), args.frames, args.frame_time, flaky=args.flaky)
+        server = EventLoopServer(node.app, args.port + i)
+        server.start()
+        servers.append(server)
+        print(f"http://localhost:{args.port + i}/?key={node.key}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# files.py
+# Listing and serving rendered frames from the render output directory. Files
+# are opened here and handed to the server as FileResponses, so their bytes
+# go from the page cache to the socket with sendfile and never pass through
+# Python. Validators come from (mtime, size), so no file is ever hashed.
+import mimetypes
+import os
+from email.utils import formatdate
+
+from .protocol import FileResponse, Response, etag_matches
+
+# Extensions Blender writes that mimetypes does not know.
+EXTRA_TYPES = {
+    ".exr": "image/x-exr",
+    ".hdr": "image/vnd.radiance",
+    ".dpx": "image/x-dpx",
+    ".cin": "image/x-cineon",
+    ".tga": "image/x-tga",
+}
+FRAME_EXTENSIONS = (".png", ".jpg", ".jpeg", ".exr", ".hdr", ".tif", ".tiff",
+                    ".bmp", ".webp", ".dpx", ".cin", ".tga", ".jp2")
+
+def content_type_for(name):
+    ext = os.path.splitext(name)[1].lower()
+    if ext in EXTRA_TYPES:
+        return EXTRA_TYPES[ext]
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+def file_etag(st):
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+def list_frames(directory):
+    """Frames in `directory` as dicts sorted by name, or None if it cannot be read."""
+    frames = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(FRAME_EXTENSIONS):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                frames.append({"name": entry.name, "size": st.st_size, "mtime": st.st_mtime})
+    except OSError:
+        return None
+    frames.sort(key=lambda frame: frame["name"])
+    return frames
+
+def parse_range(header, size):
+    """
+    Parse a single `bytes=` range against a file of `size` bytes. Returns
+    (start, end) inclusive, None to ignore the header and send everything, or
+    False when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # multipart ranges are not worth it for a preview; send it all
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                return False
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if end < start:
+        return None  # not a valid range (RFC 7233): ignore it and send everything
+    if start >= size:
+        return False
+    return start, min(end, size - 1)
+
+def file_response(request, directory, name, extra_names=()):
+    """
+    Serve `name` from `directory`, honouring If-None-Match, Range and
+    If-Range. Only frames (FRAME_EXTENSIONS) and the files in `extra_names`
+    are served, never anything else that happens to be in the folder.
+    """
+    if not name or name != os.path.basename(name) or name in (".", "..") or "\x00" in name:
+        return Response(404, "Not Found")
+    if not name.lower().endswith(FRAME_EXTENSIONS) and name not in extra_names:
+        return Response(404, "Not Found")
+    path = os.path.join(directory, name)
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return Response(404, "Not Found")
+    try:
+        st = os.fstat(f.fileno())
+        etag = file_etag(st)
+        headers = [("ETag", etag), ("Last-Modified", formatdate(st.st_mtime, usegmt=True)),
+                   ("Accept-Ranges", "bytes"), ("Cache-Control", "no-cache")]
+        if etag_matches(request, etag):
+            f.close()
+            return Response(304, headers=headers)
+        size = st.st_size
+        byte_range = None
+        range_header = request.header("range")
+        if range_header and request.header("if-range", etag) == etag:
+            byte_range = parse_range(range_header, size)
+        if byte_range is False:
+            f.close()
+            return Response(416, "Range Not Satisfiable",
+                            headers=headers + [("Content-Range", f"bytes */{size}")])
+        content_type = content_type_for(name)
+        if byte_range is None:
+            return FileResponse(200, f, 0, size, content_type, headers)
+        start, end = byte_range
+        headers.append(("Content-Range", f"bytes {start}-{end}/{size}"))
+        return FileResponse(206, f, start, end - start + 1, content_type, headers)
+    except Exception:
+        f.close()
+        raise
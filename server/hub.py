@@ -0,0 +1,337 @@
+# hub.py
+# Fleet hub: watches many render nodes (Blender instances running this addon's
+# server, each with its own key) and serves one combined dashboard and JSON
+# feed. It needs no Blender; run it from the addon folder:
+#
+#     python -m server.hub --node "http://[2001:db8::10]:8080/?key=..." --node ...
+#     python -m server.hub --nodes-file nodes.txt --port 8090
+#
+# Nodes are polled for /stats.bin by a bounded pool of threads, each node over
+# its own persistent HTTP/1.1 connection with If-None-Match, so an unchanged
+# node costs one small request and a 304. Failing nodes back off
+# exponentially. Use server/fakenode.py to try it without a render farm.
+import argparse
+import html
+import http.client
+import json
+import random
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, quote, urlparse
+
+from . import compression, statsbin
+from .dashboard import load_static, stylesheet
+from .eventloop import EventLoopServer
+from .protocol import Response, etag_matches
+
+DEFAULT_PORT = 8090
+POLL_INTERVAL = 1.0
+NODE_TIMEOUT = 3.0
+MAX_CONCURRENT_POLLS = 16
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# A node that has not answered for this long is shown as stale, not up.
+STALE_AFTER = 10.0
+# Hub versions restart with the hub, so tag ETags with a per-process token.
+ETAG_TOKEN = secrets.token_hex(4)
+
+script = load_static("hub.js", "application/javascript; charset=utf-8")
+assets = {stylesheet.url: stylesheet, script.url: script}
+
+class Node:
+    """One render node, polled over a persistent connection from pool threads."""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme != "http" or not parsed.hostname:
+            raise ValueError(f"Node URL must be http://host:port/?key=...: {url!r}")
+        self.host = parsed.hostname
+        self.port = parsed.port or 8080
+        key = parse_qs(parsed.query).get("key", [""])[0]
+        self.name = f"[{self.host}]:{self.port}" if ":" in self.host else f"{self.host}:{self.port}"
+        self.path = f"/stats.bin?key={quote(key)}"
+        self.connection = None
+        self.etag = None
+        self.stats = None
+        self.last_ok = None
+        self.latency = None
+        self.failures = 0
+        self.error = ""
+        self.next_poll = 0.0
+        self.in_flight = False
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def request(self, timeout):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        self.connection.request("GET", self.path, headers=headers)
+        response = self.connection.getresponse()
+        body = response.read()
+        if response.will_close:
+            self.close()
+        return response.status, body, response.getheader("ETag")
+
+    def poll(self, timeout):
+        """
+        Fetch the node's stats once. Returns (stats or None if unchanged, etag);
+        raises OSError or HTTPException when the node is unreachable or broken.
+        """
+        while True:
+            reused = self.connection is not None
+            try:
+                status, body, etag = self.request(timeout)
+                break
+            except (ConnectionError, http.client.BadStatusLine):
+                # The node may have closed an idle keep-alive connection; one
+                # retry on a fresh connection tells that apart from a dead node.
+                self.close()
+                if not reused:
+                    raise
+            except Exception:
+                self.close()
+                raise
+        if status == 304:
+            return None, etag
+        if status != 200:
+            raise http.client.HTTPException(f"HTTP {status}")
+        try:
+            return statsbin.decode_stats(body), etag
+        except ValueError as e:
+            raise http.client.HTTPException(str(e))
+
+    def health(self, now):
+        if self.last_ok is None:
+            return "down"
+        if self.failures or now - self.last_ok > STALE_AFTER:
+            return "stale"
+        return "up"
+
+class FleetHub:
+    def __init__(self, urls, poll_interval=POLL_INTERVAL, timeout=NODE_TIMEOUT,
+                 max_concurrency=MAX_CONCURRENT_POLLS):
+        self.nodes = [Node(url) for url in urls]
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.version = 0
+        self.cache = (None, b"")  # (version, fleet JSON) of the last snapshot served
+        self.thread = None
+        self.pool = None
+
+    def start(self):
+        self.pool = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                       thread_name_prefix="RenderStatsHubPoll")
+        self.thread = threading.Thread(target=self.run, name="RenderStatsHub", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+        for node in self.nodes:
+            node.close()
+
+    def run(self):
+        """Hand every due node to the pool; a node is never polled twice at once."""
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            wake_at = now + self.poll_interval
+            with self.lock:
+                for node in self.nodes:
+                    if node.in_flight:
+                        continue
+                    if node.next_poll <= now:
+                        node.in_flight = True
+                        self.pool.submit(self.poll_node, node)
+                    else:
+                        wake_at = min(wake_at, node.next_poll)
+            self.stop_event.wait(max(0.05, wake_at - now))
+
+    def poll_node(self, node):
+        started = time.monotonic()
+        try:
+            stats, etag = node.poll(self.timeout)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            with self.lock:
+                node.failures += 1
+                node.error = error
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** node.failures)
+                # Jitter keeps nodes that failed together from retrying together.
+                node.next_poll = time.monotonic() + delay * random.uniform(0.5, 1.0)
+                node.in_flight = False
+                self.version += 1
+            return
+        now = time.monotonic()
+        with self.lock:
+            changed = stats is not None or node.failures or node.error
+            if stats is not None:
+                node.stats = stats
+                node.etag = etag
+            node.failures = 0
+            node.error = ""
+            node.last_ok = now
+            node.latency = now - started
+            node.next_poll = started + self.poll_interval
+            node.in_flight = False
+            if changed:
+                self.version += 1
+
+    def snapshot(self):
+        """Aggregate progress, ETA and per-node health as a JSON-ready dict."""
+        now = time.monotonic()
+        nodes = []
+        frames_done = frames_total = 0
+        eta = 0.0
+        health_counts = {"up": 0, "stale": 0, "down": 0}
+        with self.lock:
+            for node in self.nodes:
+                health = node.health(now)
+                health_counts[health] += 1
+                entry = {
+                    "name": node.name,
+                    "health": health,
+                    "error": node.error,
+                    "latency_ms": None if node.latency is None else round(node.latency * 1000, 1),
+                    "stats": node.stats,
+                }
+                nodes.append(entry)
+                stats = node.stats
+                if stats is None:
+                    continue
+                # Count frames within each node's own range: a node rendering
+                # 1001-1100 at frame 1050 is half done, not at 1050 of 1100.
+                in_range = stats["frames_in_range"]
+                if in_range is not None:
+                    frames_done += max(0, in_range - stats["remaining_frames"])
+                    frames_total += max(0, in_range)
+                else:
+                    # Layout 1 nodes do not report their range; weight their
+                    # progress by their frame count as best we can.
+                    total = max(0, stats["total_frames"])
+                    frames_done += round(total * stats["progress_percentage"] / 100)
+                    frames_total += total
+                if stats["render_active"] and health != "down":
+                    # Nodes render in parallel: the fleet finishes with its slowest node.
+                    eta = max(eta, stats["total_expected_time"])
+            version = self.version
+        return {
+            "version": version,
+            "nodes": nodes,
+            "health": health_counts,
+            "frames_done": frames_done,
+            "frames_total": frames_total,
+            "progress_percentage": frames_done / frames_total * 100 if frames_total else 0,
+            "eta": eta,
+        }
+
+    def fleet_json(self):
+        """Serialize the snapshot once per hub version."""
+        with self.lock:
+            version = self.version
+        cached_version, body = self.cache
+        if cached_version != version:
+            body = json.dumps(self.snapshot()).encode("utf-8")
+            self.cache = (version, body)
+        return version, body
+
+def render_page(access_key):
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Render Fleet</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <link rel="stylesheet" href="{stylesheet.url}">
+</head>
+<body data-key="{html.escape(access_key)}">
+    <div id="container">
+        <h1>Render Fleet</h1>
+        <div class="stat">Frames: <span id="frames_done"></span> / <span id="frames_total"></span></div>
+        <div id="progressBarContainer">
+            <div id="progressBar">0%</div>
+        </div>
+        <div class="stat">Fleet ETA: <span id="eta"></span> s</div>
+        <div class="stat">Nodes: <span id="health"></span></div>
+        <h2>Nodes</h2>
+        <table id="nodes">
+            <thead><tr><th>Node</th><th>Health</th><th>Frame</th><th>Progress</th><th>ETA (s)</th><th>Latency (ms)</th></tr></thead>
+            <tbody></tbody>
+        </table>
+    </div>
+    <script src="{script.url}"></script>
+</body>
+</html>
+"""
+
+def make_app(hub, access_key):
+    page = render_page(access_key).encode("utf-8")
+
+    def app(request):
+        if request.path.startswith("/assets/"):
+            asset = assets.get(request.path)
+            if asset is None:
+                return Response(404, "Not Found")
+            return Response(200, asset.data, asset.content_type,
+                            [("Cache-Control", "public, max-age=31536000, immutable")])
+        if request.arg("key") != access_key:
+            return Response(403, "Forbidden")
+        if request.path == "/fleet.json":
+            version, body = hub.fleet_json()
+            etag = f'"fleet-{ETAG_TOKEN}-{version}"'
+            headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+            if etag_matches(request, etag):
+                return Response(304, content_type="application/json", headers=headers)
+            response = Response(200, body, "application/json", headers)
+        else:
+            response = Response(200, page, "text/html; charset=utf-8")
+        return compression.compress_response(request, response)
+    return app
+
+def read_nodes_file(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Combined dashboard for many Render-Stats nodes.")
+    parser.add_argument("--node", action="append", default=[], help="node URL including ?key=")
+    parser.add_argument("--nodes-file", help="file with one node URL per line")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--key", help="access key for the hub itself (random if omitted)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls of a node")
+    parser.add_argument("--timeout", type=float, default=NODE_TIMEOUT, help="per-node request timeout")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_POLLS, help="polls in flight at once")
+    args = parser.parse_args(argv)
+    urls = list(args.node)
+    if args.nodes_file:
+        urls += read_nodes_file(args.nodes_file)
+    if not urls:
+        parser.error("give at least one --node or a --nodes-file")
+    access_key = args.key or secrets.token_urlsafe(12)
+    hub = FleetHub(urls, args.interval, args.timeout, args.concurrency)
+    server = EventLoopServer(make_app(hub, access_key), args.port)
+    hub.start()
+    server.start()
+    print(f"Watching {len(hub.nodes)} nodes. Dashboard: http://localhost:{args.port}/?key={access_key}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        hub.stop()
+
+if __name__ == "__main__":
+    main()
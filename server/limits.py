@@ -0,0 +1,72 @@
+# limits.py
+# Admission limits for the background server: connection caps, a per-IP
+# token bucket, request size limits and read/write deadlines. Everything is
+# checked on the server thread before a request is parsed, so abusive clients
+# are dropped for the price of a dict lookup.
+import time
+
+# Canned responses for early rejects; sent with a single non-blocking send.
+REJECT_BUSY = (b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n"
+               b"Retry-After: 1\r\nConnection: close\r\n\r\n")
+REJECT_RATE = (b"HTTP/1.1 429 Too Many Requests\r\nContent-Length: 0\r\n"
+               b"Retry-After: 1\r\nConnection: close\r\n\r\n")
+
+class ServerLimits:
+    def __init__(self, max_connections=256, max_connections_per_ip=64,
+                 requests_per_second=20.0, request_burst=100,
+                 max_header_size=16384, max_body_size=65536,
+                 header_timeout=10.0, write_timeout=30.0):
+        self.max_connections = max_connections
+        self.max_connections_per_ip = max_connections_per_ip
+        self.requests_per_second = requests_per_second
+        self.request_burst = request_burst
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.header_timeout = header_timeout
+        self.write_timeout = write_timeout
+
+    @property
+    def max_input_size(self):
+        """Most unprocessed input a connection may buffer: one full request."""
+        return self.max_header_size + 4 + self.max_body_size
+
+class RateLimiter:
+    """Per-IP token buckets refilled at `rate` tokens per second up to `burst`."""
+
+    # Buckets untouched for this long are full again and can be forgotten.
+    PRUNE_AFTER = 60.0
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # ip -> [tokens, last refill time]
+        self.last_prune = time.monotonic()
+
+    def _refill(self, ip, now):
+        bucket = self.buckets.get(ip)
+        if bucket is None:
+            bucket = self.buckets[ip] = [float(self.burst), now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def has_tokens(self, ip):
+        """Cheap admission check at accept time; does not consume a token."""
+        return self._refill(ip, time.monotonic())[0] >= 1.0
+
+    def consume(self, ip):
+        bucket = self._refill(ip, time.monotonic())
+        if bucket[0] < 1.0:
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    def prune(self):
+        now = time.monotonic()
+        if now - self.last_prune < self.PRUNE_AFTER:
+            return
+        self.last_prune = now
+        stale = now - self.PRUNE_AFTER
+        for ip in [ip for ip, bucket in self.buckets.items() if bucket[1] < stale]:
+            del self.buckets[ip]
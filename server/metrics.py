@@ -0,0 +1,267 @@
+# metrics.py
+# Counters for the Prometheus text exposition at /metrics and the sidebar
+# panel. Everything is counted as it happens (a dict increment or a bisect
+# per request), so a scrape only formats a few dozen numbers. The server
+# thread is the only writer of ServerMetrics; a scrape that races an update
+# is off by one request at most, which Prometheus tolerates.
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; frames range from a fraction of a second to hours.
+FRAME_TIME_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+# Seconds spent in the request handler on the server thread.
+HANDLER_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+# Seconds from accept (or the first byte of a follow-up request) to the last
+# byte of the response leaving; long-polls are held for up to a minute.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60)
+# Seconds Blender spends in one of this addon's timers or handlers.
+CALLBACK_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1)
+
+# Route labels, so odd paths cannot blow up label cardinality. Entries ending
+# in "/" match by prefix; anything else is "other".
+ROUTES = ("/", "/stats", "/stats.bin", "/log", "/log/query", "/events", "/ws", "/metrics",
+          "/thumb.jpg", "/stream.mjpg", "/frames/", "/assets/")
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket and summed when rendered."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.bounds = [format_value(b) for b in self.buckets] + ["+Inf"]
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile; None when empty."""
+        if not self.count:
+            return None
+        target = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= target:
+                return bound
+        return float("inf")
+
+    def copy(self):
+        other = Histogram.__new__(Histogram)
+        other.buckets = self.buckets
+        other.counts = list(self.counts)
+        other.sum = self.sum
+        other.count = self.count
+        other.bounds = self.bounds
+        return other
+
+    def render(self, name, lines, labels=""):
+        prefix = labels + "," if labels else ""
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {total}')
+        suffix = "{" + labels + "}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {format_value(self.sum)}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+def route_label(path):
+    for route in ROUTES:
+        if path == route or (route.endswith("/") and route != "/" and path.startswith(route)):
+            return route
+    return "other"
+
+class ServerMetrics:
+    def __init__(self):
+        self.requests = {}  # (route, status) -> count
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.recv_calls = 0
+        self.send_calls = 0
+        self.active_connections = 0
+        self.handler_seconds = Histogram(HANDLER_BUCKETS)
+        self.latency = {}  # route -> Histogram of accept-to-last-byte seconds
+
+    def count_response(self, path, status):
+        """Count one response and return its route label."""
+        # path is None for requests rejected before they were parsed.
+        route = "rejected" if path is None else route_label(path)
+        key = (route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        return route
+
+    def observe_latency(self, route, seconds):
+        histogram = self.latency.get(route)
+        if histogram is None:
+            histogram = self.latency[route] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+
+    def total_latency(self):
+        """All routes' latencies in one histogram, for the panel."""
+        total = Histogram(LATENCY_BUCKETS)
+        for histogram in list(self.latency.values()):
+            total.merge(histogram)
+        return total
+
+    def render(self, lines):
+        lines.append("# HELP render_stats_http_requests_total HTTP responses by route and status.")
+        lines.append("# TYPE render_stats_http_requests_total counter")
+        for (route, status), count in sorted(self.requests.items()):
+            lines.append(f'render_stats_http_requests_total{{route="{route}",status="{status}"}} {count}')
+        lines.append("# HELP render_stats_http_sent_bytes_total Bytes written to client sockets.")
+        lines.append("# TYPE render_stats_http_sent_bytes_total counter")
+        lines.append(f"render_stats_http_sent_bytes_total {self.bytes_sent}")
+        lines.append("# HELP render_stats_http_received_bytes_total Bytes read from client sockets.")
+        lines.append("# TYPE render_stats_http_received_bytes_total counter")
+        lines.append(f"render_stats_http_received_bytes_total {self.bytes_received}")
+        lines.append("# HELP render_stats_syscalls_total Socket recv and send calls made by the server thread.")
+        lines.append("# TYPE render_stats_syscalls_total counter")
+        lines.append(f'render_stats_syscalls_total{{call="recv"}} {self.recv_calls}')
+        lines.append(f'render_stats_syscalls_total{{call="send"}} {self.send_calls}')
+        lines.append("# HELP render_stats_http_active_connections Open client connections.")
+        lines.append("# TYPE render_stats_http_active_connections gauge")
+        lines.append(f"render_stats_http_active_connections {self.active_connections}")
+        lines.append("# HELP render_stats_http_handler_seconds Time spent building each response on the server thread.")
+        lines.append("# TYPE render_stats_http_handler_seconds histogram")
+        self.handler_seconds.render("render_stats_http_handler_seconds", lines)
+        lines.append("# HELP render_stats_http_request_duration_seconds Accept (or request start) to last response byte sent.")
+        lines.append("# TYPE render_stats_http_request_duration_seconds histogram")
+        for route, histogram in sorted(self.latency.items()):
+            histogram.render("render_stats_http_request_duration_seconds", lines, f'route="{route}"')
+
+class AddonMetrics:
+    """
+    Time Blender spends inside this addon's timers and render handlers, on
+    whichever thread Blender calls them from, and log records dropped under
+    load. Written from several threads, so updates take a lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = {}  # callback name -> Histogram of seconds
+        self.total = 0.0
+        self.window_start = time.monotonic()
+        self.window_total = 0.0
+        self.log_records_dropped = 0
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.callbacks.get(name)
+            if histogram is None:
+                histogram = self.callbacks[name] = Histogram(CALLBACK_BUCKETS)
+            histogram.observe(seconds)
+            self.total += seconds
+
+    def count_log_drop(self):
+        """Count a log record dropped because the log queue was full."""
+        with self.lock:
+            self.log_records_dropped += 1
+
+    def reset_window(self):
+        """Start a new cost window, e.g. when a render starts."""
+        with self.lock:
+            self.window_start = time.monotonic()
+            self.window_total = self.total
+
+    def cost_ms_per_second(self):
+        """Milliseconds of callback time per wall-clock second since the window started."""
+        with self.lock:
+            elapsed = time.monotonic() - self.window_start
+            spent = self.total - self.window_total
+        return spent * 1000 / elapsed if elapsed > 0 else 0.0
+
+    def calls(self):
+        with self.lock:
+            return sum(histogram.count for histogram in self.callbacks.values())
+
+    def render(self, lines):
+        with self.lock:
+            callbacks = sorted((name, histogram.copy()) for name, histogram in self.callbacks.items())
+            dropped = self.log_records_dropped
+        lines.append("# HELP render_stats_blender_callback_seconds Time Blender spent in this addon's timers and handlers.")
+        lines.append("# TYPE render_stats_blender_callback_seconds histogram")
+        for name, histogram in callbacks:
+            histogram.render("render_stats_blender_callback_seconds", lines, f'callback="{name}"')
+        lines.append("# HELP render_stats_log_records_dropped_total Log records dropped because the log queue was full.")
+        lines.append("# TYPE render_stats_log_records_dropped_total counter")
+        lines.append(f"render_stats_log_records_dropped_total {dropped}")
+
+addon_metrics = AddonMetrics()
+
+def timed(name):
+    """Decorator recording each call's duration in addon_metrics under `name`."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                addon_metrics.observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+# Shared by the background server (the only writer) and the /metrics route.
+server_metrics = ServerMetrics()
+
+def render_metrics(stats, frames_completed, frame_times, server=None, addon=None):
+    """
+    Prometheus text for a stats snapshot, the frame counter, the frame-time
+    histogram and, when given, the server's and Blender callbacks' counters.
+    """
+    lines = [
+        "# HELP render_stats_frames_completed_total Frames rendered since Blender started.",
+        "# TYPE render_stats_frames_completed_total counter",
+        f"render_stats_frames_completed_total {frames_completed}",
+        "# HELP render_stats_current_frame Frame most recently rendered.",
+        "# TYPE render_stats_current_frame gauge",
+        f"render_stats_current_frame {format_value(stats['current_frame'])}",
+        "# HELP render_stats_total_frames Last frame of the render.",
+        "# TYPE render_stats_total_frames gauge",
+        f"render_stats_total_frames {format_value(stats['total_frames'])}",
+        "# HELP render_stats_expected_remaining_seconds Estimated time until the render finishes.",
+        "# TYPE render_stats_expected_remaining_seconds gauge",
+        f"render_stats_expected_remaining_seconds {format_value(stats['total_expected_time'])}",
+        "# HELP render_stats_expected_remaining_seconds_low Lower edge of the remaining-time band.",
+        "# TYPE render_stats_expected_remaining_seconds_low gauge",
+        f"render_stats_expected_remaining_seconds_low {format_value(stats['eta_low'])}",
+        "# HELP render_stats_expected_remaining_seconds_high Upper edge of the remaining-time band.",
+        "# TYPE render_stats_expected_remaining_seconds_high gauge",
+        f"render_stats_expected_remaining_seconds_high {format_value(stats['eta_high'])}",
+        "# HELP render_stats_remaining_frames Frames left to render, counting the frame step.",
+        "# TYPE render_stats_remaining_frames gauge",
+        f"render_stats_remaining_frames {format_value(stats['remaining_frames'])}",
+        "# HELP render_stats_render_active Whether a render is in progress.",
+        "# TYPE render_stats_render_active gauge",
+        f"render_stats_render_active {format_value(bool(stats['render_active']))}",
+        "# HELP render_stats_frame_time_seconds Time taken by each rendered frame.",
+        "# TYPE render_stats_frame_time_seconds histogram",
+    ]
+    frame_times.render("render_stats_frame_time_seconds", lines)
+    if server is not None:
+        server.render(lines)
+    if addon is not None:
+        addon.render(lines)
+    lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,198 @@
+# protocol.py
+# Minimal HTTP/1.x helpers shared by the blocking handler in main.py and the
+# background event loop in eventloop.py.
+from urllib.parse import urlparse, parse_qs
+
+HEADER_END = b"\r\n\r\n"
+
+REASONS = {
+    101: "Switching Protocols",
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    416: "Range Not Satisfiable",
+    426: "Upgrade Required",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+class Request:
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        parsed = urlparse(target)
+        self.path = parsed.path
+        self.query = parse_qs(parsed.query)
+
+    def arg(self, name, default=None):
+        return self.query.get(name, [default])[0]
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    @property
+    def content_length(self):
+        try:
+            return max(0, int(self.header("content-length", "0")))
+        except ValueError:
+            return 0
+
+    @property
+    def wants_keep_alive(self):
+        # HTTP/1.1 connections are persistent unless the client says otherwise;
+        # HTTP/1.0 ones only when the client explicitly asks for it.
+        tokens = [t.strip().lower() for t in self.header("connection", "").split(",")]
+        if self.version == "HTTP/1.1":
+            return "close" not in tokens
+        return "keep-alive" in tokens
+
+class Response:
+    def __init__(self, status, body=b"", content_type="text/plain", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = list(headers) if headers else []
+
+    @property
+    def content_length(self):
+        return len(self.body)
+
+    def encode_head(self, keep_alive=False, keep_alive_header=None):
+        """Serialize the status line and headers, including the blank line."""
+        lines = [f"HTTP/1.1 {self.status} {REASONS.get(self.status, 'Unknown')}"]
+        if self.status != 304:
+            lines.append(f"Content-Type: {self.content_type}")
+            lines.append(f"Content-Length: {self.content_length}")
+        lines.extend(f"{name}: {value}" for name, value in self.headers)
+        if keep_alive:
+            lines.append("Connection: keep-alive")
+            if keep_alive_header:
+                lines.append(f"Keep-Alive: {keep_alive_header}")
+        else:
+            lines.append("Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    def encode(self, keep_alive=False, keep_alive_header=None):
+        """Serialize status line, headers and body into one bytes object."""
+        return self.encode_head(keep_alive, keep_alive_header) + self.body
+
+class FileResponse(Response):
+    """
+    A response whose body is `length` bytes of the open binary `file` starting
+    at `offset`. The body is never read into Python memory: the event loop
+    hands it to os.sendfile. The blocking handler on Blender's main thread
+    does not send files; it answers 503. The receiver owns `file` and must
+    close it.
+    """
+
+    def __init__(self, status, file, offset, length, content_type, headers=None):
+        super().__init__(status, b"", content_type, headers)
+        self.file = file
+        self.offset = offset
+        self.length = length
+
+    @property
+    def content_length(self):
+        return self.length
+
+    def encode(self, keep_alive=False, keep_alive_header=None):
+        raise TypeError("FileResponse bodies must be sent with sendfile, not encoded")
+
+class StreamResponse:
+    """
+    An open-ended response: the headers (and `initial` bytes) are sent at once,
+    then the connection stays subscribed to `channel` and receives whatever the
+    server publishes there. `heartbeat` bytes are sent when the stream is idle.
+    `reader(inbuf)`, if given, consumes client data and returns `(reply, close)`;
+    without one, anything the client sends is discarded.
+    """
+
+    def __init__(self, channel, content_type, headers=None, initial=b"", heartbeat=None,
+                 status=200, reader=None):
+        self.status = status
+        self.channel = channel
+        self.content_type = content_type
+        self.headers = list(headers) if headers else []
+        self.initial = initial
+        self.heartbeat = heartbeat
+        self.reader = reader
+
+    def encode_head(self):
+        lines = [f"HTTP/1.1 {self.status} {REASONS[self.status]}"]
+        if self.content_type:
+            lines.append(f"Content-Type: {self.content_type}")
+            lines.append("Cache-Control: no-cache")
+        lines.extend(f"{name}: {value}" for name, value in self.headers)
+        if self.status != 101:
+            lines.append("Connection: keep-alive")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + self.initial
+
+# Suffixes compression.py appends to the ETag of a compressed representation.
+ETAG_ENCODING_SUFFIXES = ('-gzip"', '-deflate"')
+
+class WaitResponse:
+    """
+    A response that may be held open until `ready()` is true or `timeout`
+    seconds pass, whichever comes first; `render()` then builds the Response.
+    The server re-checks `ready()` whenever `channel` is notified.
+    """
+
+    def __init__(self, channel, ready, render, timeout):
+        self.channel = channel
+        self.ready = ready
+        self.render = render
+        self.timeout = timeout
+
+def etag_matches(request, etag):
+    """
+    True if the request's If-None-Match lists `etag` (or is a wildcard). Tags
+    of compressed representations of the same body match too.
+    """
+    header = request.header("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        for suffix in ETAG_ENCODING_SUFFIXES:
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+                break
+        if tag == etag:
+            return True
+    return False
+
+def parse_request(head):
+    """
+    Parse the request line and headers of a single request. `head` is the
+    raw bytes up to (not including) the blank line. Raises ValueError on a
+    malformed request line.
+    """
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3:
+        raise ValueError(f"Malformed request line: {lines[0]!r}")
+    method, target, version = parts
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return Request(method, target, version, headers)
+
+def build_response(status, body=b"", content_type="text/plain", extra_headers=None):
+    """Return a complete `Connection: close` response as bytes."""
+    return Response(status, body, content_type, extra_headers).encode()
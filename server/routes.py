@@ -0,0 +1,287 @@
+# routes.py
+# Request routing for the stats server. Used by both the blocking handler on
+# Blender's main thread and the background event loop, so nothing in here may
+# touch bpy.
+import json
+import logging
+import os
+import time
+from urllib.parse import unquote
+
+from ..journal import JOURNAL_NAME
+from ..logstore import DEFAULT_QUERY_LIMIT
+from ..stats import get_render_stats, get_stats_json, get_stats_version, get_log_seq, get_log_since, get_render_output, get_render_metrics, query_log
+from . import compression, dashboard, files, metrics, statsbin, thumbnail, websocket
+from .protocol import FileResponse, Response, StreamResponse, WaitResponse, etag_matches
+
+STATS_CHANNEL = "stats"
+WS_CHANNEL = "ws"
+MJPEG_CHANNEL = "mjpeg"
+MJPEG_BOUNDARY = "frame"
+SSE_HEARTBEAT = b": keep-alive\n\n"
+
+# Long-poll hold times, in seconds; kept below the ~30 s idle limit of common proxies.
+LONG_POLL_TIMEOUT = 25.0
+MAX_LONG_POLL_TIMEOUT = 60.0
+
+# Most log records one /log/query answer may carry.
+MAX_QUERY_LIMIT = 5000
+
+# Stats versions restart with Blender, so tag ETags with a per-process token.
+ETAG_TOKEN = os.urandom(4).hex()
+# ((version, log_seq, thumb_version), body) of the last lean /stats body served.
+lean_cache = (None, b"")
+# Same, for the /stats.bin record.
+binary_cache = (None, b"")
+
+def compact_json(message):
+    return json.dumps(message, separators=(",", ":"))
+
+def lean_stats(stats):
+    """Stats without the log; viewers fetch or receive log lines separately."""
+    # Look up keys one by one so a snapshot never builds its log text here.
+    lean = {key: stats[key] for key in stats if key != "log"}
+    lean["log_seq"] = get_log_seq()
+    lean["thumb_version"] = thumbnail.get_thumbnail()[0]
+    return lean
+
+def log_message(lines, seq, reset=False):
+    message = {"seq": seq, "lines": lines}
+    if reset:
+        message["reset"] = True
+    return message
+
+def format_sse(event, message):
+    """Encode one Server-Sent Events message."""
+    return f"event: {event}\ndata: {compact_json(message)}\n\n".encode("utf-8")
+
+def format_ws(kind, message):
+    message["t"] = kind
+    return websocket.encode_frame(compact_json(message))
+
+def lean_stats_json():
+    """Serialize lean stats once per (stats version, log cursor, thumbnail) triple."""
+    global lean_cache
+    stats = get_render_stats()
+    key = (stats["version"], get_log_seq(), thumbnail.get_thumbnail()[0])
+    cached_key, body = lean_cache
+    if cached_key != key:
+        lean = lean_stats(stats)
+        lean["log_seq"] = key[1]
+        lean["thumb_version"] = key[2]
+        body = json.dumps(lean).encode("utf-8")
+        lean_cache = (key, body)
+    return key, body
+
+def binary_stats():
+    """Pack the /stats.bin record once per (stats version, log cursor, thumbnail) triple."""
+    global binary_cache
+    stats = get_render_stats()
+    key = (stats["version"], get_log_seq(), thumbnail.get_thumbnail()[0])
+    cached_key, body = binary_cache
+    if cached_key != key:
+        body = statsbin.encode_stats(stats, key[1], key[2])
+        binary_cache = (key, body)
+    return key, body
+
+def binary_stats_response(request):
+    (version, log_seq, thumb_version), body = binary_stats()
+    etag = f'"{ETAG_TOKEN}-bin-{version}-{log_seq}-{thumb_version}"'
+    headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+    if etag_matches(request, etag):
+        return Response(304, headers=headers)
+    return Response(200, body, statsbin.CONTENT_TYPE, headers)
+
+def stats_response(request):
+    if request.arg("lean") == "1":
+        (version, log_seq, thumb_version), body = lean_stats_json()
+        etag = f'"{ETAG_TOKEN}-{version}-{log_seq}-{thumb_version}"'
+    else:
+        version, body = get_stats_json()
+        etag = f'"{ETAG_TOKEN}-{version}"'
+    headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+    if etag_matches(request, etag):
+        return Response(304, content_type="application/json", headers=headers)
+    return Response(200, body, "application/json", headers)
+
+def long_poll_stats(request, respond=stats_response):
+    """
+    /stats?wait=<version>: hold the request until a newer snapshot is
+    published, then answer it with `respond(request)`.
+    """
+    try:
+        wait_version = int(request.arg("wait"))
+        timeout = float(request.arg("timeout", LONG_POLL_TIMEOUT))
+    except ValueError:
+        return Response(400, "wait and timeout must be numbers")
+    timeout = min(max(timeout, 0.0), MAX_LONG_POLL_TIMEOUT)
+    return WaitResponse(
+        STATS_CHANNEL,
+        ready=lambda: get_stats_version() > wait_version,
+        render=lambda: compression.compress_response(request, respond(request)),
+        timeout=timeout,
+    )
+
+def parse_level(value):
+    """A logging level from a number or a name such as "warning"."""
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value.upper())
+    if not isinstance(level, int):
+        raise ValueError(f"unknown level {value!r}")
+    return level
+
+def log_query_response(request):
+    """/log/query?level=&since_ts=&last=&contains=&limit=: filtered log records, oldest first."""
+    try:
+        min_level = parse_level(request.arg("level", "0"))
+        since_ts = request.arg("since_ts")
+        since_ts = float(since_ts) if since_ts is not None else None
+        last = request.arg("last")
+        if last is not None:
+            # Relative to the server's clock, so viewers need not agree with it.
+            since_ts = max(since_ts or 0.0, time.time() - float(last))
+        limit = min(int(request.arg("limit", str(DEFAULT_QUERY_LIMIT))), MAX_QUERY_LIMIT)
+    except ValueError as e:
+        return Response(400, f"Bad log query: {e}")
+    records, seq = query_log(min_level, since_ts, request.arg("contains") or None, limit)
+    return Response(200, compact_json({"seq": seq, "records": records}), "application/json")
+
+def initial_log_message():
+    lines, seq, _ = get_log_since(0)
+    return log_message(lines, seq, reset=True)
+
+def thumbnail_response(request):
+    version, data = thumbnail.get_thumbnail()
+    if not version:
+        return Response(404, "No thumbnail yet")
+    etag = f'"{ETAG_TOKEN}-thumb-{version}"'
+    headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+    if etag_matches(request, etag):
+        return Response(304, headers=headers)
+    return Response(200, data, "image/jpeg", headers)
+
+def mjpeg_part(data):
+    """One multipart/x-mixed-replace part holding the JPEG `data`."""
+    head = (f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n").encode("ascii")
+    return head + data + b"\r\n"
+
+def mjpeg_response():
+    """A live preview: each new thumbnail replaces the previous one in the same response."""
+    version, data = thumbnail.get_thumbnail()
+    initial = mjpeg_part(data) if version else b""
+    return StreamResponse(MJPEG_CHANNEL, f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+                          initial=initial)
+
+def metrics_response():
+    stats, frames_completed, frame_times = get_render_metrics()
+    body = metrics.render_metrics(stats, frames_completed, frame_times,
+                                  metrics.server_metrics, metrics.addon_metrics)
+    return Response(200, body, metrics.CONTENT_TYPE, [("Cache-Control", "no-cache")])
+
+def frames_response(request):
+    """/frames/ lists the render output folder; /frames/<name> serves one file from it."""
+    directory, latest = get_render_output()
+    if not directory:
+        return Response(404, "Nothing has been rendered yet")
+    name = unquote(request.path[len("/frames/"):])
+    if name:
+        return files.file_response(request, directory, name, extra_names=(JOURNAL_NAME,))
+    frames = files.list_frames(directory)
+    if frames is None:
+        return Response(404, "Render output folder not found")
+    if not any(frame["name"] == latest for frame in frames):
+        latest = None
+    return Response(200, compact_json({"latest": latest, "frames": frames}), "application/json",
+                    [("Cache-Control", "no-cache")])
+
+def publish_stats(server, stats):
+    """Fan a new stats snapshot out to every stream. Runs on the server thread."""
+    lean = lean_stats(stats)
+    # Keyed by "stats" so a slow viewer only ever has the newest snapshot queued.
+    server.publish(STATS_CHANNEL, format_sse("stats", lean), key="stats")
+    server.publish(WS_CHANNEL, format_ws("stats", lean), key="stats")
+    server.notify(STATS_CHANNEL)
+
+def publish_thumbnail(server, version, data):
+    """
+    Tell every stats stream a new thumbnail is ready, and push the JPEG itself
+    to MJPEG viewers. Keyed, so a slow viewer only gets the newest frame.
+    """
+    message = {"version": version}
+    server.publish(STATS_CHANNEL, format_sse("thumb", message), key="thumb")
+    server.publish(WS_CHANNEL, format_ws("thumb", message), key="thumb")
+    if server.hub.subscriber_count(MJPEG_CHANNEL):
+        server.publish(MJPEG_CHANNEL, mjpeg_part(data), key="frame")
+
+def publish_log_line(server, seq, line):
+    # A None line means the log was cleared.
+    message = log_message([] if line is None else [line], seq, reset=line is None)
+    server.publish(STATS_CHANNEL, format_sse("log", message))
+    server.publish(WS_CHANNEL, format_ws("log", message))
+
+def precheck_request_line(line, access_key):
+    """
+    Cheap reject on the raw request line, before headers are read or parsed.
+    Only ever rejects; handle_request still does the full key check.
+    """
+    parts = line.split(b" ")
+    if len(parts) != 3 or not parts[2].startswith(b"HTTP/"):
+        return Response(400, "Bad Request")
+    target = parts[1]
+    if target.startswith(b"/assets/"):
+        return None
+    if b"key=" + access_key.encode("ascii") not in target:
+        return Response(403, "Forbidden")
+    return None
+
+def handle_request(request, access_key):
+    """Return the Response for a parsed request, compressed when the client allows."""
+    response = route_request(request, access_key)
+    if isinstance(response, (StreamResponse, WaitResponse, FileResponse)):
+        return response
+    return compression.compress_response(request, response)
+
+def route_request(request, access_key):
+    if request.path.startswith("/assets/"):
+        # Static, content-hashed files carry no render data and need no key.
+        return dashboard.asset_response(request)
+    if request.arg("key") != access_key:
+        return Response(403, "Forbidden")
+
+    if request.method == "GET" and request.path == "/stats":
+        if request.arg("wait") is not None:
+            return long_poll_stats(request)
+        return stats_response(request)
+    if request.method == "GET" and request.path == "/stats.bin":
+        if request.arg("wait") is not None:
+            return long_poll_stats(request, binary_stats_response)
+        return binary_stats_response(request)
+    if request.method == "GET" and request.path == "/log":
+        try:
+            since = int(request.arg("since", "0"))
+        except ValueError:
+            return Response(400, "since must be an integer")
+        lines, seq, reset = get_log_since(since)
+        return Response(200, compact_json(log_message(lines, seq, reset)), "application/json")
+    if request.method == "GET" and request.path == "/log/query":
+        return log_query_response(request)
+    if request.method == "GET" and request.path == "/events":
+        initial = (format_sse("stats", lean_stats(get_render_stats()))
+                   + format_sse("log", initial_log_message()))
+        return StreamResponse(STATS_CHANNEL, "text/event-stream", initial=initial,
+                              heartbeat=SSE_HEARTBEAT)
+    if request.method == "GET" and request.path == "/metrics":
+        return metrics_response()
+    if request.method == "GET" and request.path == "/thumb.jpg":
+        return thumbnail_response(request)
+    if request.method == "GET" and request.path == "/stream.mjpg":
+        return mjpeg_response()
+    if request.method == "GET" and request.path.startswith("/frames/"):
+        return frames_response(request)
+    if request.path == "/ws":
+        initial = (format_ws("stats", lean_stats(get_render_stats()))
+                   + format_ws("log", initial_log_message()))
+        return websocket.handshake(request, WS_CHANNEL, initial)
+    return dashboard.page_response(request, access_key)
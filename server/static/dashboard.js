@@ -0,0 +1,219 @@
+// dashboard.js
+// Client for the render stats page. The access key is read from <body data-key>
+// so this file is identical for every session and can be cached forever.
+const accessKey = document.body.dataset.key;
+// Version of the snapshot on screen, for /stats?wait=.
+let statsVersion = -1;
+
+function showStats(data) {
+    statsVersion = data.version;
+    document.getElementById('current_frame').textContent = data.current_frame;
+    document.getElementById('total_frames').textContent = data.total_frames;
+    document.getElementById('last_frame_time').textContent = data.last_frame_time;
+    document.getElementById('total_expected_time').textContent = data.total_expected_time;
+    document.getElementById('render_active').textContent = data.render_active ? "Yes" : "No";
+    let outputFile = document.getElementById('output_file');
+    if (data.output_file && outputFile.textContent !== data.output_file) {
+        outputFile.textContent = data.output_file;
+        outputFile.href = '/frames/' + encodeURIComponent(data.output_file) + '?key=' + accessKey;
+    }
+    showThumbnail(data.thumb_version);
+    let progress = data.progress_percentage || 0;
+    let progressBar = document.getElementById('progressBar');
+    progressBar.style.width = progress + '%';
+    progressBar.textContent = progress.toFixed(2) + '%';
+}
+// The preview only reloads when the server reports a newer thumbnail.
+let thumbVersion = 0;
+function showThumbnail(version) {
+    if (!version || version <= thumbVersion) {
+        return;
+    }
+    thumbVersion = version;
+    let thumbnail = document.getElementById('thumbnail');
+    thumbnail.src = '/thumb.jpg?key=' + accessKey + '&v=' + version;
+    thumbnail.hidden = false;
+}
+// Log lines arrive as {seq, lines, reset}; logSeq is the cursor for /log?since=.
+let logSeq = -1;
+function appendLog(message) {
+    if (logFiltered()) {
+        // New lines may or may not pass the filter; ask the server.
+        logSeq = message.seq;
+        scheduleLogQuery();
+        return;
+    }
+    let logConsole = document.getElementById('logconsole');
+    if (message.reset) {
+        logConsole.textContent = '';
+    }
+    if (message.lines.length > 0) {
+        logConsole.textContent += message.lines.join("\n") + "\n";
+        logConsole.scrollTop = logConsole.scrollHeight;
+    }
+    logSeq = message.seq;
+}
+function fetchLog() {
+    fetch('/log?since=' + logSeq + '&key=' + accessKey)
+        .then(response => response.json())
+        .then(appendLog)
+        .catch(error => console.error('Error fetching log:', error));
+}
+// With a level or time filter set, the console shows /log/query results
+// instead of the live tail; they are refetched at most once a second.
+let logQueryTimer = null;
+function logFiltered() {
+    return document.getElementById('loglevel').value !== ''
+        || document.getElementById('loglastminute').checked;
+}
+function queryLog() {
+    logQueryTimer = null;
+    let url = '/log/query?limit=1000&key=' + accessKey;
+    let level = document.getElementById('loglevel').value;
+    if (level) {
+        url += '&level=' + level;
+    }
+    if (document.getElementById('loglastminute').checked) {
+        url += '&last=60';
+    }
+    fetch(url)
+        .then(response => response.json())
+        .then(result => {
+            let logConsole = document.getElementById('logconsole');
+            logConsole.textContent = result.records.map(record => record.line + "\n").join('');
+            logConsole.scrollTop = logConsole.scrollHeight;
+        })
+        .catch(error => console.error('Error querying log:', error));
+}
+function scheduleLogQuery() {
+    if (logQueryTimer === null) {
+        logQueryTimer = setTimeout(queryLog, 1000);
+    }
+}
+function logFilterChanged() {
+    if (logFiltered()) {
+        queryLog();
+    } else {
+        // Back to the live tail: refetch everything retained.
+        logSeq = -1;
+        fetchLog();
+    }
+}
+document.getElementById('loglevel').addEventListener('change', logFilterChanged);
+document.getElementById('loglastminute').addEventListener('change', logFilterChanged);
+// Decodes a /stats.bin record; the layout is documented in server/statsbin.py.
+function decodeStatsBin(buffer) {
+    let view = new DataView(buffer);
+    if (view.byteLength < 60 || view.getUint32(0, true) !== 0x42545352) {  // "RSTB"
+        throw new Error('Not a stats record');
+    }
+    return {
+        version: view.getUint32(8, true) + view.getUint32(12, true) * 4294967296,
+        current_frame: view.getInt32(16, true),
+        total_frames: view.getInt32(20, true),
+        progress_percentage: view.getFloat64(24, true),
+        last_frame_time: view.getFloat64(32, true),
+        total_expected_time: view.getFloat64(40, true),
+        render_active: (view.getUint8(48) & 1) !== 0,
+        log_seq: view.getUint32(52, true),
+        thumb_version: view.getUint32(56, true),
+        remaining_frames: view.byteLength >= 68 ? view.getInt32(60, true) : undefined,
+        frames_in_range: view.byteLength >= 68 ? view.getInt32(64, true) : undefined,
+    };
+}
+// The first fetch takes lean JSON, which also names the latest frame file;
+// long-polls take the binary record.
+function fetchStats(wait) {
+    let request;
+    if (wait) {
+        request = fetch('/stats.bin?wait=' + statsVersion + '&key=' + accessKey)
+            .then(response => response.arrayBuffer())
+            .then(decodeStatsBin);
+    } else {
+        request = fetch('/stats?lean=1&key=' + accessKey)
+            .then(response => response.json());
+    }
+    return request
+        .then(data => {
+            let changed = data.version !== statsVersion;
+            showStats(data);
+            if (data.log_seq !== logSeq) {
+                fetchLog();
+            }
+            return changed;
+        });
+}
+// Live updates are pushed over a WebSocket, or Server-Sent Events where
+// WebSockets are unavailable. While neither is up, long-poll /stats.bin: the
+// server holds each request until the next frame finishes. Unchanged answers
+// (a timeout, or a server that cannot hold requests) pause for a second.
+let polling = false;
+let pollGeneration = 0;
+function pollLoop(generation) {
+    if (!polling || generation !== pollGeneration) {
+        return;
+    }
+    fetchStats(true)
+        .then(changed => setTimeout(pollLoop, changed ? 0 : 1000, generation))
+        .catch(error => {
+            console.error('Error fetching stats:', error);
+            setTimeout(pollLoop, 1000, generation);
+        });
+}
+function startPolling() {
+    if (!polling) {
+        polling = true;
+        pollGeneration += 1;
+        pollLoop(pollGeneration);
+    }
+}
+function stopPolling() {
+    polling = false;
+}
+function connectEventSource() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    let source = new EventSource('/events?key=' + accessKey);
+    source.addEventListener('stats', event => {
+        stopPolling();
+        showStats(JSON.parse(event.data));
+    });
+    source.addEventListener('log', event => appendLog(JSON.parse(event.data)));
+    source.addEventListener('thumb', event => showThumbnail(JSON.parse(event.data).version));
+    source.onerror = startPolling;
+}
+function connectWebSocket() {
+    if (!window.WebSocket) {
+        connectEventSource();
+        return;
+    }
+    let opened = false;
+    let scheme = location.protocol === 'https:' ? 'wss://' : 'ws://';
+    let socket = new WebSocket(scheme + location.host + '/ws?key=' + accessKey);
+    socket.onopen = () => {
+        opened = true;
+        stopPolling();
+    };
+    socket.onmessage = event => {
+        let message = JSON.parse(event.data);
+        if (message.t === 'stats') {
+            showStats(message);
+        } else if (message.t === 'log') {
+            appendLog(message);
+        } else if (message.t === 'thumb') {
+            showThumbnail(message.version);
+        }
+    };
+    socket.onclose = () => {
+        if (opened) {
+            startPolling();
+            setTimeout(connectWebSocket, 2000);
+        } else {
+            connectEventSource();
+        }
+    };
+}
+connectWebSocket();
+fetchStats(false).catch(error => console.error('Error fetching stats:', error));
@@ -0,0 +1,47 @@
+// hub.js
+const accessKey = document.body.dataset.key;
+let fleetVersion = -1;
+function cell(row, text, className) {
+    let td = row.insertCell();
+    td.textContent = text;
+    if (className) {
+        td.className = className;
+    }
+}
+function showFleet(fleet) {
+    fleetVersion = fleet.version;
+    document.getElementById('frames_done').textContent = fleet.frames_done;
+    document.getElementById('frames_total').textContent = fleet.frames_total;
+    document.getElementById('eta').textContent = fleet.eta.toFixed(1);
+    document.getElementById('health').textContent =
+        fleet.health.up + ' up, ' + fleet.health.stale + ' stale, ' + fleet.health.down + ' down';
+    let progressBar = document.getElementById('progressBar');
+    progressBar.style.width = fleet.progress_percentage + '%';
+    progressBar.textContent = fleet.progress_percentage.toFixed(2) + '%';
+    let body = document.querySelector('#nodes tbody');
+    body.textContent = '';
+    for (let node of fleet.nodes) {
+        let row = body.insertRow();
+        let stats = node.stats;
+        cell(row, node.name);
+        cell(row, node.error ? node.health + ' (' + node.error + ')' : node.health, node.health);
+        cell(row, stats ? stats.current_frame + ' / ' + stats.total_frames : '-');
+        cell(row, stats ? stats.progress_percentage.toFixed(1) + '%' : '-');
+        cell(row, stats && stats.render_active ? stats.total_expected_time.toFixed(1) : '-');
+        cell(row, node.latency_ms === null ? '-' : node.latency_ms);
+    }
+}
+// The hub re-serializes only when a node changes; the browser revalidates
+// with If-None-Match, so an idle fleet costs a 304 every two seconds.
+function refresh() {
+    fetch('/fleet.json?key=' + accessKey)
+        .then(response => response.json())
+        .then(fleet => {
+            if (fleet.version !== fleetVersion) {
+                showFleet(fleet);
+            }
+        })
+        .catch(error => console.error('Error fetching fleet:', error))
+        .finally(() => setTimeout(refresh, 2000));
+}
+refresh();
@@ -0,0 +1,97 @@
+# statsbin.py
+# The /stats.bin wire format: one fixed-layout little-endian record, for
+# pollers that want the counters without parsing JSON. Imports nothing from
+# the addon, so scrapers can copy this file or run it directly:
+#
+#     python statsbin.py "http://[::1]:8080/stats.bin?key=<key>"
+#
+# Layout version 2 (68 bytes):
+#
+#   offset size type     field
+#        0    4 char[4]  magic, b"RSTB"
+#        4    2 uint16   layout version (2)
+#        6    2 uint16   record size in bytes (68)
+#        8    8 uint64   stats version
+#       16    4 int32    current frame
+#       20    4 int32    total frames
+#       24    8 float64  progress percentage
+#       32    8 float64  last frame time, seconds
+#       40    8 float64  total expected time, seconds
+#       48    1 uint8    flags: bit 0 = render active
+#       49    3          padding
+#       52    4 uint32   log sequence number (cursor for /log?since=)
+#       56    4 uint32   thumbnail version
+#       60    4 int32    frames remaining (layout 2)
+#       64    4 int32    frames in the range, respecting start and step (layout 2)
+#
+# Later layouts only append fields and bump the version and size, so a v1
+# reader can decode the first 60 bytes of any newer record.
+import struct
+import urllib.request
+
+MAGIC = b"RSTB"
+LAYOUT_VERSION = 2
+RECORD_V1 = struct.Struct("<4sHHQiidddB3xII")
+RECORD = struct.Struct("<4sHHQiidddB3xIIii")
+LAYOUT_2 = struct.Struct("<ii")  # the fields layout 2 appends
+CONTENT_TYPE = "application/octet-stream"
+
+FLAG_RENDER_ACTIVE = 1
+
+def encode_stats(stats, log_seq=0, thumb_version=0):
+    flags = FLAG_RENDER_ACTIVE if stats.get("render_active") else 0
+    return RECORD.pack(
+        MAGIC, LAYOUT_VERSION, RECORD.size,
+        stats.get("version", 0),
+        int(stats.get("current_frame", 0)),
+        int(stats.get("total_frames", 0)),
+        float(stats.get("progress_percentage", 0)),
+        float(stats.get("last_frame_time", 0)),
+        float(stats.get("total_expected_time", 0)),
+        flags,
+        log_seq & 0xFFFFFFFF,
+        thumb_version & 0xFFFFFFFF,
+        int(stats.get("remaining_frames", 0)),
+        int(stats.get("frames_in_range", 0)),
+    )
+
+def decode_stats(data):
+    """
+    Decode a /stats.bin record into a dict. Raises ValueError if it is not
+    one. remaining_frames and frames_in_range are None in a layout 1 record.
+    """
+    if len(data) < RECORD_V1.size:
+        raise ValueError(f"stats record too short: {len(data)} bytes")
+    (magic, layout, size, version, current_frame, total_frames, progress,
+     last_frame_time, total_expected_time, flags, log_seq, thumb_version) = RECORD_V1.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"not a stats record: magic {magic!r}")
+    if size < RECORD_V1.size or len(data) < size:
+        raise ValueError(f"bad stats record size {size}")
+    remaining_frames = frames_in_range = None
+    if layout >= 2 and size >= RECORD.size:
+        remaining_frames, frames_in_range = LAYOUT_2.unpack_from(data, RECORD_V1.size)
+    return {
+        "layout_version": layout,
+        "version": version,
+        "current_frame": current_frame,
+        "total_frames": total_frames,
+        "progress_percentage": progress,
+        "last_frame_time": last_frame_time,
+        "total_expected_time": total_expected_time,
+        "render_active": bool(flags & FLAG_RENDER_ACTIVE),
+        "log_seq": log_seq,
+        "thumb_version": thumb_version,
+        "remaining_frames": remaining_frames,
+        "frames_in_range": frames_in_range,
+    }
+
+def fetch_stats(url, timeout=5.0):
+    """Fetch and decode one /stats.bin record from `url` (which must include ?key=)."""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return decode_stats(response.read())
+
+if __name__ == "__main__":
+    import sys
+    for url in sys.argv[1:]:
+        print(url, fetch_stats(url))
@@ -0,0 +1,103 @@
+# thumbnail.py
+# A small JPEG preview of the latest rendered frame. The render thread only
+# hands over a file path; a worker thread loads, downscales and encodes it
+# once, and the server serves the same bytes to every viewer. Frames that
+# finish while the worker is busy are skipped in favour of the newest one.
+import io
+import threading
+
+THUMB_SIZE = 480  # longest edge, in pixels
+THUMB_QUALITY = 75
+
+lock = threading.Lock()
+wake = threading.Event()
+pending_path = None
+worker = None
+running = False
+# (version, jpeg bytes) of the latest thumbnail; version 0 means none yet.
+current = (0, b"")
+
+# Callables invoked as listener(version, jpeg) on the worker thread whenever a
+# new thumbnail is ready. Like stats listeners they must only hand it off.
+thumbnail_listeners = []
+
+def add_thumbnail_listener(listener):
+    if listener not in thumbnail_listeners:
+        thumbnail_listeners.append(listener)
+
+def remove_thumbnail_listener(listener):
+    if listener in thumbnail_listeners:
+        thumbnail_listeners.remove(listener)
+
+def get_thumbnail():
+    """Return (version, jpeg bytes) of the latest thumbnail."""
+    with lock:
+        return current
+
+def submit(path):
+    """Queue `path` for thumbnailing. Cheap enough to call from the render thread."""
+    global pending_path
+    with lock:
+        pending_path = path
+    wake.set()
+
+def encode_thumbnail(path, size=THUMB_SIZE, quality=THUMB_QUALITY):
+    """Downscale the image at `path` to a JPEG no larger than `size` on either edge."""
+    from PIL import Image
+    with Image.open(path) as image:
+        # Lets the JPEG decoder skip straight to a reduced scale.
+        image.draft("RGB", (size, size))
+        image.thumbnail((size, size))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+def run():
+    global pending_path, current
+    while True:
+        wake.wait()
+        wake.clear()
+        with lock:
+            path, pending_path = pending_path, None
+        if not running:
+            return
+        if path is None:
+            continue
+        try:
+            data = encode_thumbnail(path)
+        except Exception as e:
+            print("Could not create thumbnail for", path, "-", e)
+            continue
+        with lock:
+            version = current[0] + 1
+            current = (version, data)
+        for listener in list(thumbnail_listeners):
+            try:
+                listener(version, data)
+            except Exception as e:
+                print("Error in thumbnail listener:", e)
+
+def start():
+    """Start the worker thread, unless Pillow is missing."""
+    global worker, running
+    if worker is not None:
+        return
+    try:
+        import PIL  # installed by the dependency activation step
+    except ImportError:
+        print("Pillow not available; frame thumbnails are disabled.")
+        return
+    running = True
+    worker = threading.Thread(target=run, name="RenderStatsThumbnails", daemon=True)
+    worker.start()
+
+def stop():
+    global worker, running
+    if worker is None:
+        return
+    running = False
+    wake.set()
+    worker.join(timeout=2.0)
+    worker = None
@@ -0,0 +1,105 @@
+# websocket.py
+# Dependency-free RFC 6455 support for the background server: the opening
+# handshake, frame encoding, and parsing of client frames (ping/pong/close).
+import base64
+import hashlib
+import struct
+
+from .protocol import Response, StreamResponse
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_CLIENT_PAYLOAD = 64 * 1024
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+CLOSE_NORMAL = 1000
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_TOO_BIG = 1009
+
+def accept_key(client_key):
+    digest = hashlib.sha1((client_key + WS_GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+def encode_frame(payload, opcode=OP_TEXT):
+    """Encode one unmasked, unfragmented server frame."""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 0x10000:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+def encode_close(code):
+    return encode_frame(struct.pack("!H", code), OP_CLOSE)
+
+PING_FRAME = encode_frame(b"", OP_PING)
+
+def unmask(data, mask):
+    repeated = (mask * (len(data) // 4 + 1))[:len(data)]
+    masked = int.from_bytes(data, "big") ^ int.from_bytes(repeated, "big")
+    return masked.to_bytes(len(data), "big")
+
+def read_frames(inbuf):
+    """
+    Consume every complete client frame in `inbuf` (a bytearray) and return
+    `(reply_bytes, close)`. Pings are answered with pongs, close frames are
+    echoed, and data frames are ignored: the channel is server-to-client only.
+    """
+    reply = bytearray()
+    while len(inbuf) >= 2:
+        first, second = inbuf[0], inbuf[1]
+        opcode = first & 0x0F
+        masked = second & 0x80
+        length = second & 0x7F
+        offset = 2
+        if length == 126:
+            if len(inbuf) < 4:
+                break
+            length = struct.unpack_from("!H", inbuf, 2)[0]
+            offset = 4
+        elif length == 127:
+            if len(inbuf) < 10:
+                break
+            length = struct.unpack_from("!Q", inbuf, 2)[0]
+            offset = 10
+        if not masked:
+            return bytes(reply) + encode_close(CLOSE_PROTOCOL_ERROR), True
+        if length > MAX_CLIENT_PAYLOAD:
+            return bytes(reply) + encode_close(CLOSE_TOO_BIG), True
+        if len(inbuf) < offset + 4 + length:
+            break
+        mask = bytes(inbuf[offset:offset + 4])
+        payload = unmask(bytes(inbuf[offset + 4:offset + 4 + length]), mask)
+        del inbuf[:offset + 4 + length]
+        if opcode == OP_PING:
+            reply += encode_frame(payload, OP_PONG)
+        elif opcode == OP_CLOSE:
+            code = payload[:2] if len(payload) >= 2 else struct.pack("!H", CLOSE_NORMAL)
+            return bytes(reply) + encode_frame(code, OP_CLOSE), True
+    return bytes(reply), False
+
+def handshake(request, channel, initial=b""):
+    """Return the 101 StreamResponse for a valid upgrade request, else an error Response."""
+    if request.method != "GET" or request.header("upgrade", "").lower() != "websocket":
+        return Response(400, "Expected a WebSocket upgrade")
+    client_key = request.header("sec-websocket-key")
+    if not client_key:
+        return Response(400, "Missing Sec-WebSocket-Key")
+    if request.header("sec-websocket-version") != "13":
+        return Response(426, "Unsupported WebSocket version", headers=[("Sec-WebSocket-Version", "13")])
+    headers = [
+        ("Upgrade", "websocket"),
+        ("Connection", "Upgrade"),
+        ("Sec-WebSocket-Accept", accept_key(client_key)),
+    ]
+    return StreamResponse(channel, None, headers=headers, initial=initial,
+                          heartbeat=PING_FRAME, status=101, reader=read_frames)
@@ -0,0 +1,118 @@
+# snapshot.py
+# One published set of render stats. A snapshot is never changed once built:
+# the render thread publishes the next one by rebinding a single module
+# global, which is atomic, so readers on the server thread, in panel draw or
+# in an exporter just read that global and never lock or copy. The one
+# exception is the log text: the snapshot records the log's seq at publish
+# time, and the first reader of stats["log"] joins the lines up to that seq,
+# briefly holding the log store's lock.
+import json
+from collections.abc import Mapping
+
+from .timing import DEFAULT_ETA_METHOD
+
+# Keys, in the order they are serialized.
+FIELDS = (
+    "current_frame",
+    "total_frames",
+    "progress_percentage",
+    "last_frame_time",
+    "mean_frame_time",
+    "min_frame_time",
+    "max_frame_time",
+    "rolling_frame_time",
+    "remaining_frames",
+    "frames_in_range",
+    "total_expected_time",
+    "eta_low",
+    "eta_high",
+    "eta_method",
+    "render_active",
+    "output_file",
+    "log",
+    "version",
+)
+FIELD_SET = frozenset(FIELDS)
+
+class StatsSnapshot(Mapping):
+    """
+    Read-only mapping of FIELDS, plus frames_completed. Reads like the dict
+    it replaces (stats["current_frame"], stats.get(...), dict(stats)), but
+    assigning to it raises AttributeError.
+
+    `log` may be a callable returning the log text instead of the text. It
+    must return the same text whenever it is called, e.g. the log up to a
+    seq fixed at publish time; it is called the first time a reader asks
+    for stats["log"] (or serializes the snapshot), off the render thread,
+    and the text kept.
+    """
+    __slots__ = FIELDS + ("frames_completed", "cached_json")
+
+    def __init__(self, current_frame=0, total_frames=0, progress_percentage=0,
+                 last_frame_time=0, mean_frame_time=0, min_frame_time=0, max_frame_time=0,
+                 rolling_frame_time=0, remaining_frames=0, frames_in_range=0, total_expected_time=0,
+                 eta_low=0, eta_high=0, eta_method=DEFAULT_ETA_METHOD, render_active=False,
+                 output_file="", log="", version=0, frames_completed=0):
+        init = object.__setattr__
+        init(self, "current_frame", current_frame)
+        init(self, "total_frames", total_frames)
+        init(self, "progress_percentage", progress_percentage)
+        init(self, "last_frame_time", last_frame_time)
+        init(self, "mean_frame_time", mean_frame_time)
+        init(self, "min_frame_time", min_frame_time)
+        init(self, "max_frame_time", max_frame_time)
+        init(self, "rolling_frame_time", rolling_frame_time)
+        init(self, "remaining_frames", remaining_frames)
+        init(self, "frames_in_range", frames_in_range)
+        init(self, "total_expected_time", total_expected_time)
+        init(self, "eta_low", eta_low)
+        init(self, "eta_high", eta_high)
+        init(self, "eta_method", eta_method)
+        init(self, "render_active", render_active)
+        init(self, "output_file", output_file)
+        init(self, "log", log)
+        init(self, "version", version)
+        init(self, "frames_completed", frames_completed)
+        init(self, "cached_json", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StatsSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("StatsSnapshot is immutable")
+
+    def __getitem__(self, key):
+        if key not in FIELD_SET:
+            raise KeyError(key)
+        if key == "log":
+            return self.log_text()
+        return getattr(self, key)
+
+    def log_text(self):
+        text = self.log
+        if callable(text):
+            text = text()
+            object.__setattr__(self, "log", text)
+        return text
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return f"StatsSnapshot({dict(self)!r})"
+
+    def to_json(self):
+        """
+        UTF-8 JSON of the snapshot. Encoded on first use, by whichever reader
+        gets there first rather than on the render thread, then reused for
+        every viewer. Two readers racing both encode it; the log text is
+        fixed at publish time, so they produce the same bytes.
+        """
+        data = self.cached_json
+        if data is None:
+            data = json.dumps(dict(self)).encode("utf-8")
+            object.__setattr__(self, "cached_json", data)
+        return data
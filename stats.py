@@ -1,85 +1,399 @@
 import logging
-import threading
+import os
+import queue
+from functools import partial
+from logging.handlers import QueueHandler, QueueListener
 
-# Global variable to store the most recent render statistics.
-current_render_stats = {}
+from .journal import FRAME_DONE, JOURNAL_NAME, FrameJournal
+from .logstore import DEFAULT_QUERY_LIMIT, LogStore
+from .snapshot import StatsSnapshot
+from .server.metrics import FRAME_TIME_BUCKETS, Histogram, addon_metrics, timed
+from .timing import ETA_METHODS, ETAEstimator, FrameClock, FrameTimes, frames_done, frames_remaining
 
-# Global log string that accumulates log messages.
-render_log = ""
-# Lock for synchronizing log updates.
-log_lock = threading.Lock()
+# Recent formatted log lines with sequence numbers, so viewers can fetch only
+# what they missed. Retention is set with set_log_retention.
+log_store = LogStore()
+
+# Callables invoked as listener(seq, line) for each formatted log line, on the
+# log listener thread. line is None when the log has just been cleared.
+log_listeners = []
+
+def notify_log_listeners(seq, line):
+    for listener in list(log_listeners):
+        try:
+            listener(seq, line)
+        except Exception as e:
+            print("Error in log listener:", e)
 
 class LogHandler(logging.Handler):
     def emit(self, record):
-        global render_log
+        if getattr(record, "clear_log", False):
+            clear_log_store()
+            return
         msg = self.format(record)
-        with log_lock:
-            render_log += msg + "\n"
-            # Simple log rotation: keep only the last 10,000 characters.
-            if len(render_log) > 10000:
-                render_log = render_log[-10000:]
+        # format() has filled in record.message and, for exceptions, exc_text.
+        message = record.message
+        if record.exc_text:
+            message += "\n" + record.exc_text
+        seq = log_store.append(record.created, record.levelno, record.name, message, msg)
+        notify_log_listeners(seq, msg)
         print(msg)
 
+# Records waiting for the listener thread. Bounded so a flood of log calls
+# cannot grow memory without limit; records that do not fit are dropped and
+# counted in addon_metrics.
+LOG_QUEUE_SIZE = 10000
+log_queue = queue.Queue(LOG_QUEUE_SIZE)
+
+def clear_log_store():
+    seq = log_store.clear()
+    notify_log_listeners(seq, None)
+
+def queue_log_clear():
+    """
+    Clear the log store from the listener thread, after every record queued
+    before this call, so viewers never get lines of the previous render
+    after the reset.
+    """
+    record = logging.LogRecord("RenderStatsLogger", logging.NOTSET, __file__, 0,
+                               "log cleared", None, None)
+    record.clear_log = True
+    try:
+        log_queue.put_nowait(record)
+    except queue.Full:
+        # Dropping the clear would keep the previous render's log; clearing
+        # here may let a few of its queued lines through, which is better.
+        clear_log_store()
+
+class LogQueueHandler(QueueHandler):
+    """
+    The only handler on the logger: whichever thread logs (often the render
+    thread) just enqueues the record, and the listener thread formats,
+    stores and prints it.
+    """
+
+    def prepare(self, record):
+        # The default prepare formats the message here, on the caller's thread.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            addon_metrics.count_log_drop()
+
 logger = logging.getLogger("RenderStatsLogger")
 logger.setLevel(logging.DEBUG)
 logger.handlers = []
 handler = LogHandler()
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 handler.setFormatter(formatter)
-logger.addHandler(handler)
+logger.addHandler(LogQueueHandler(log_queue))
+log_listener = None
+
+def start_log_listener():
+    """Start the thread that drains log_queue; records logged before it starts wait in the queue."""
+    global log_listener
+    if log_listener is not None:
+        return
+    log_listener = QueueListener(log_queue, handler)
+    log_listener.start()
+
+def stop_log_listener():
+    """Handle every record already queued, then stop the listener thread."""
+    global log_listener
+    if log_listener is None:
+        return
+    listener, log_listener = log_listener, None
+    try:
+        listener.stop()
+    except queue.Full:
+        # No room for the stop sentinel; the daemon thread keeps draining
+        # until Blender exits.
+        print("Log queue full; log listener left running.")
+
+# The latest published stats. Only the render thread (render_post and
+# render_init) writes here, always by rebinding the name to a new immutable
+# snapshot, so readers on any thread take no lock and make no copy (except
+# the first reader of a snapshot's log text; see snapshot.py). Each
+# snapshot gets the next version and is serialized to JSON at most once.
+current_snapshot = StatsSnapshot()
+
+# Observed as frames finish so /metrics only has to format it. Readers see it
+# without a lock; a scrape that races an update may be one frame behind in
+# some buckets, which Prometheus tolerates.
+frame_time_histogram = Histogram(FRAME_TIME_BUCKETS)
+
+# Measured frame durations of the current render; reset at render_init.
+frame_clock = FrameClock()
+frame_times = FrameTimes()
+eta_estimator = ETAEstimator(frame_times)
+
+# On-disk journal of this render's frames in the output folder, opened at
+# render_init; None when the folder is not writable.
+frame_journal = None
+# Set at render_init; the journal's history is taken up at the first
+# render_pre, once it is known which frames this render covers.
+journal_resume_pending = False
+
+# Absolute path of the last frame Blender wrote (or of the first frame it will
+# write, right after render_init), so the server can find the output folder.
+# Rebound, never mutated, like current_snapshot.
+render_output_path = ""
+
+# Callables invoked with each newly published StatsSnapshot. They run on whatever
+# thread fired render_post, so they must only hand the stats off, never block.
+stats_listeners = []
+
+# Callables invoked with the path of each frame file Blender has just written,
+# on the render thread. Same rules as stats listeners.
+frame_listeners = []
+
+def add_frame_listener(listener):
+    if listener not in frame_listeners:
+        frame_listeners.append(listener)
+
+def remove_frame_listener(listener):
+    if listener in frame_listeners:
+        frame_listeners.remove(listener)
+
+def add_stats_listener(listener):
+    if listener not in stats_listeners:
+        stats_listeners.append(listener)
+
+def remove_stats_listener(listener):
+    if listener in stats_listeners:
+        stats_listeners.remove(listener)
+
+def add_log_listener(listener):
+    if listener not in log_listeners:
+        log_listeners.append(listener)
+
+def remove_log_listener(listener):
+    if listener in log_listeners:
+        log_listeners.remove(listener)
 
-# Global lock for stats updates.
-stats_lock = threading.Lock()
+def set_log_retention(max_lines=None, max_bytes=None):
+    """Keep at most `max_lines` log lines and `max_bytes` of log text."""
+    log_store.configure(max_lines, max_bytes)
 
+def get_render_log():
+    return log_store.text()
+
+def get_log_seq():
+    return log_store.seq
+
+def get_log_since(since):
+    """
+    Return (lines, seq, reset): the log lines appended after cursor `since`
+    and the cursor to pass next time. reset is True when the cursor predates
+    the retained window or the last clear, in which case lines holds
+    everything retained and the caller should discard what it has.
+    """
+    return log_store.since(since)
+
+def query_log(min_level=0, since_ts=None, contains=None, limit=DEFAULT_QUERY_LIMIT):
+    """
+    Return (records, seq): the newest `limit` retained log records at level
+    `min_level` or above, logged at or after `since_ts` (seconds since the
+    epoch) and containing `contains` (ignoring case), oldest first, as dicts
+    with seq, time, level, level_name, logger, message and line.
+    """
+    entries, seq = log_store.query(min_level, since_ts, contains, limit)
+    return [entry.to_dict() for entry in entries], seq
+
+def frame_output_path(scene, frame):
+    """Absolute path Blender writes `frame` to, or "" if it cannot be resolved."""
+    try:
+        return scene.render.frame_path(frame=frame)
+    except (AttributeError, RuntimeError):
+        return ""
+
+@timed("render_pre")
+def frame_started_handler(scene):
+    """Registered with render_pre: stamps the start of the frame about to render."""
+    global journal_resume_pending
+    if journal_resume_pending:
+        journal_resume_pending = False
+        resume_from_journal(scene.frame_current)
+    frame_clock.start()
+    if frame_journal is not None:
+        frame_journal.frame_started(scene.frame_current)
+
+@timed("render_post")
 def update_render_stats_handler(scene):
     """
     This handler is called after each rendered frame (via render_post).
-    It updates the global statistics dictionary with the current frame,
-    total frames, estimated times, and accumulates the current log.
+    It builds the next immutable StatsSnapshot (current frame, progress,
+    frame times and ETA) and publishes it by swapping current_snapshot.
+    The snapshot records the log's current seq; the text up to that seq is
+    only joined when a reader first asks for it.
     """
-    global current_render_stats, render_log
+    global current_snapshot, render_output_path
+    previous = current_snapshot
     current_frame = scene.frame_current
     total_frames = scene.frame_end
-    last_frame_time = 0.033  # Replace with real measurement if available.
-    total_expected_time = (total_frames - current_frame) * last_frame_time
+    # None when render_pre was missed, e.g. the addon was enabled mid-frame.
+    elapsed = frame_clock.stop()
+    if elapsed is not None:
+        frame_times.add(elapsed)
+        eta_estimator.add(elapsed)
+        if frame_journal is not None:
+            frame_journal.frame_done(current_frame, elapsed)
+    last_frame_time = frame_times.last
+    remaining_frames = frames_remaining(current_frame, total_frames, scene.frame_step)
+    total_expected_time, eta_low, eta_high = eta_estimator.estimate(remaining_frames)
     render_active = True  # Update based on actual render state if available.
 
-    progress_percentage = (current_frame / total_frames * 100) if total_frames > 0 else 0
-
-    stats = {
-        "current_frame": current_frame,
-        "total_frames": total_frames,
-        "progress_percentage": progress_percentage,
-        "last_frame_time": last_frame_time,
-        "total_expected_time": total_expected_time,
-        "render_active": render_active,
-        "log": render_log,
-    }
-    with stats_lock:
-        current_render_stats = stats.copy()
+    done, in_range = frames_done(current_frame, scene.frame_start, total_frames, scene.frame_step)
+    progress_percentage = (done / in_range * 100) if in_range > 0 else 0
+    output_path = frame_output_path(scene, current_frame)
+
+    stats = StatsSnapshot(
+        current_frame=current_frame,
+        total_frames=total_frames,
+        progress_percentage=progress_percentage,
+        last_frame_time=last_frame_time,
+        mean_frame_time=frame_times.mean,
+        min_frame_time=frame_times.min,
+        max_frame_time=frame_times.max,
+        rolling_frame_time=frame_times.rolling_mean,
+        remaining_frames=remaining_frames,
+        frames_in_range=in_range,
+        total_expected_time=total_expected_time,
+        eta_low=eta_low,
+        eta_high=eta_high,
+        eta_method=eta_estimator.method,
+        render_active=render_active,
+        output_file=os.path.basename(output_path),
+        log=partial(log_store.text, upto=log_store.seq),
+        version=previous.version + 1,
+        frames_completed=previous.frames_completed + 1,
+    )
+    if elapsed is not None:
+        frame_time_histogram.observe(elapsed)
+    render_output_path = output_path
+    # The single publishing step: readers see the old snapshot or this one.
+    current_snapshot = stats
+    for listener in list(stats_listeners):
+        try:
+            listener(stats)
+        except Exception as e:
+            print("Error in stats listener:", e)
     logger.info(f"Frame {current_frame} rendered. Progress: {progress_percentage:.2f}%")
 
+@timed("render_write")
+def frame_written_handler(scene):
+    """
+    Registered with render_write, which fires once the frame file is on disk
+    (render_post fires before Blender saves it).
+    """
+    path = frame_output_path(scene, scene.frame_current)
+    if not path:
+        return
+    for listener in list(frame_listeners):
+        try:
+            listener(path)
+        except Exception as e:
+            print("Error in frame listener:", e)
+
+@timed("render_init")
 def clear_render_log(scene):
     """
     Clear the global render log when a new render is starting.
     This handler is registered with render_init.
     """
-    global render_log
-    with log_lock:
-        render_log = ""
+    global render_output_path
+    queue_log_clear()
+    addon_metrics.reset_window()
+    frame_clock.stop()  # drop a frame left unfinished by a cancelled render
+    frame_times.clear()
+    eta_estimator.clear()
+    render_output_path = frame_output_path(scene, scene.frame_start)
     logger.info("Render log cleared at render initialization.")
+    open_frame_journal(scene)
+
+def open_frame_journal(scene):
+    """
+    Open the journal in the output folder. If it holds an unfinished run of
+    the same frame range, e.g. from before Blender crashed, its frame times
+    are fed to the estimators at the first render_pre, so progress and ETA
+    carry on where they were.
+    """
+    global frame_journal, journal_resume_pending
+    close_frame_journal()
+    journal_resume_pending = False
+    directory = os.path.dirname(render_output_path)
+    if not directory:
+        return
+    path = os.path.join(directory, JOURNAL_NAME)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        frame_journal = FrameJournal(path, scene.frame_start, scene.frame_end, scene.frame_step)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Frame journal disabled, cannot open {path}: {e}")
+        return
+    journal_resume_pending = True
+
+def resume_from_journal(first_frame):
+    """
+    Feed the journaled durations of frames before `first_frame`, the first
+    frame this render actually renders, to the estimators. Blender renders
+    the range in order, so those frames will not be measured again, while
+    journaled frames from `first_frame` on (all of them when the whole range
+    is rendered again) would be counted twice.
+    """
+    if frame_journal is None:
+        return
+    frames, statuses, durations = frame_journal.durations()
+    resumed = 0
+    try:
+        for frame, status, duration in zip(frames, statuses, durations):
+            if status == FRAME_DONE and frame < first_frame:
+                frame_times.add(duration)
+                eta_estimator.add(duration)
+                resumed += 1
+    finally:
+        # The views pin the mapping, which close() must be able to unmap.
+        frames.release()
+        statuses.release()
+        durations.release()
+    if resumed:
+        logger.info(f"Resumed timing of {resumed} frames from {frame_journal.path}.")
+
+def close_frame_journal():
+    """Sync and close the frame journal, if one is open."""
+    global frame_journal
+    if frame_journal is not None:
+        frame_journal.close()
+        frame_journal = None
+
+def set_eta_method(method):
+    """Choose the ETA estimator (one of timing.ETA_METHODS) from the next frame on."""
+    if method not in ETA_METHODS:
+        raise ValueError(f"Unknown ETA method: {method!r}")
+    eta_estimator.method = method
 
 def get_render_stats():
-    global current_render_stats
-    with stats_lock:
-        if not current_render_stats:
-            return {
-                "current_frame": 0,
-                "total_frames": 0,
-                "progress_percentage": 0,
-                "last_frame_time": 0,
-                "total_expected_time": 0,
-                "render_active": False,
-                "log": "",
-            }
-        return current_render_stats
+    """The latest StatsSnapshot; read-only, so callers may keep it as long as they like."""
+    return current_snapshot
+
+def get_stats_version():
+    return current_snapshot.version
+
+def get_stats_json():
+    """Return (version, json_bytes) of the latest snapshot, serialized once per snapshot."""
+    stats = current_snapshot
+    return stats.version, stats.to_json()
+
+def get_render_output():
+    """Return (directory, file name) of the latest rendered frame; ("", "") before any render."""
+    path = render_output_path
+    if not path:
+        return "", ""
+    return os.path.split(path)
+
+def get_render_metrics():
+    """Return (stats, frames completed, frame-time histogram) for /metrics."""
+    stats = current_snapshot
+    return stats, stats.frames_completed, frame_time_histogram
@@ -0,0 +1,225 @@
+# timing.py
+# Measured frame durations. render_pre stamps the start of each frame and
+# render_post records how long it took into a fixed-size ring buffer, so
+# memory stays the same whether the animation has ten frames or 100,000.
+# ETAEstimator turns those durations into a time remaining with a band.
+import math
+import time
+from array import array
+
+# Frames kept for the rolling window.
+FRAME_WINDOW = 256
+
+ETA_METHODS = ("ewma", "median", "trend")
+DEFAULT_ETA_METHOD = "ewma"
+# Weight of the newest frame in the EWMA; about the last 9 frames count.
+EWMA_ALPHA = 0.2
+# Per-frame decay of older frames in the trend fit; about the last 20 count.
+TREND_DECAY = 0.95
+# The band is the estimate +/- this many standard deviations (about 90%).
+BAND_Z = 1.645
+
+class FrameTimes:
+    """
+    Last, mean, min and max over every frame of the current render, and a
+    rolling mean over the last `capacity` frames. Updates are O(1); only the
+    render thread writes, readers get values copied into the stats snapshot.
+    """
+
+    def __init__(self, capacity=FRAME_WINDOW):
+        self.samples = array("d", bytes(8 * capacity))
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self.next = 0          # slot the next sample goes into
+        self.filled = 0        # samples held, up to capacity
+        self.count = 0         # frames measured since the last clear
+        self.total = 0.0
+        self.window_total = 0.0
+        self.last = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        i = self.next
+        if self.filled == self.capacity:
+            self.window_total -= self.samples[i]
+        else:
+            self.filled += 1
+        self.samples[i] = seconds
+        self.window_total += seconds
+        self.next = (i + 1) % self.capacity
+        if self.next == 0:
+            # Re-sum once per lap so add/subtract rounding cannot accumulate.
+            self.window_total = sum(self.samples)
+        if self.count == 0:
+            self.min = self.max = seconds
+        else:
+            self.min = min(self.min, seconds)
+            self.max = max(self.max, seconds)
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def rolling_mean(self):
+        return self.window_total / self.filled if self.filled else 0.0
+
+    def window(self):
+        """The retained samples, oldest first."""
+        if self.filled < self.capacity:
+            return self.samples[:self.filled]
+        return self.samples[self.next:] + self.samples[:self.next]
+
+class FrameClock:
+    """Pairs render_pre with render_post; at most one frame renders at a time."""
+
+    def __init__(self):
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def stop(self):
+        """Seconds since start(), or None if no frame was started."""
+        started, self.started = self.started, None
+        if started is None:
+            return None
+        return time.perf_counter() - started
+
+def frames_remaining(current, end, step=1):
+    """Frames still to render after `current` when stepping by `step` up to `end`."""
+    return max(0, (end - current) // max(1, step))
+
+def frames_done(current, start, end, step=1):
+    """(frames rendered up to and including `current`, frames in the range)."""
+    step = max(1, step)
+    total = max(0, (end - start) // step + 1)
+    return min(total, max(0, (current - start) // step + 1)), total
+
+class EWMA:
+    """Exponentially weighted mean and variance of frame times."""
+
+    def __init__(self, alpha=EWMA_ALPHA):
+        self.alpha = alpha
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def add(self, seconds):
+        if self.count == 0:
+            self.mean = seconds
+        else:
+            diff = seconds - self.mean
+            step = self.alpha * diff
+            self.mean += step
+            self.var = (1 - self.alpha) * (self.var + diff * step)
+        self.count += 1
+
+    def estimate(self, remaining):
+        # An EWMA averages over about (2 - alpha) / alpha frames.
+        n_eff = min(self.count, (2 - self.alpha) / self.alpha)
+        return self.mean, math.sqrt(self.var), n_eff
+
+class Trend:
+    """
+    Least-squares line through frame time against frame number, with older
+    frames decaying, for renders that get steadily heavier or lighter.
+    Keeps only weighted sums, so each update is O(1).
+    """
+
+    def __init__(self, decay=TREND_DECAY):
+        self.decay = decay
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.w = self.sx = self.sy = self.sxx = self.sxy = self.syy = 0.0
+
+    def add(self, seconds):
+        d = self.decay
+        x = float(self.count)
+        self.w = self.w * d + 1
+        self.sx = self.sx * d + x
+        self.sy = self.sy * d + seconds
+        self.sxx = self.sxx * d + x * x
+        self.sxy = self.sxy * d + x * seconds
+        self.syy = self.syy * d + seconds * seconds
+        self.count += 1
+
+    def fit(self):
+        """(intercept, slope, residual standard deviation)."""
+        mx, my = self.sx / self.w, self.sy / self.w
+        vxx = self.sxx / self.w - mx * mx
+        vxy = self.sxy / self.w - mx * my
+        slope = vxy / vxx if vxx > 1e-9 else 0.0
+        residual = max(0.0, self.syy / self.w - my * my - slope * vxy)
+        if self.w > 2:
+            residual *= self.w / (self.w - 2)
+        return my - slope * mx, slope, math.sqrt(residual)
+
+    def estimate(self, remaining):
+        intercept, slope, sd = self.fit()
+        # The line is straight, so the mean over the remaining frames is its
+        # value at their midpoint.
+        midpoint = self.count - 1 + (remaining + 1) / 2
+        return intercept + slope * midpoint, sd, self.w
+
+class ETAEstimator:
+    """
+    Time remaining from measured frame times, by one of ETA_METHODS:
+
+    ewma    recent frames weigh most; follows gradual changes.
+    median  median of the rolling window; ignores one-off slow frames.
+    trend   extrapolates a steady rise or fall in frame time.
+
+    Every method is updated on each frame, so switching takes effect at once.
+    """
+
+    def __init__(self, frame_times, method=DEFAULT_ETA_METHOD):
+        self.frame_times = frame_times
+        self.method = method
+        self.ewma = EWMA()
+        self.trend = Trend()
+
+    def clear(self):
+        self.ewma.clear()
+        self.trend.clear()
+
+    def add(self, seconds):
+        self.ewma.add(seconds)
+        self.trend.add(seconds)
+
+    def median(self):
+        window = sorted(self.frame_times.window())
+        last = len(window) - 1
+        median = (window[last // 2] + window[(last + 1) // 2]) / 2
+        # Interquartile range of a normal distribution is 1.349 sigma.
+        sd = (window[(3 * last) // 4] - window[last // 4]) / 1.349
+        return median, sd, len(window)
+
+    def estimate(self, remaining):
+        """(eta, low, high) in seconds for `remaining` frames; zeros before any frame."""
+        if remaining <= 0 or self.frame_times.count == 0:
+            return 0.0, 0.0, 0.0
+        if self.method == "median":
+            level, sd, n_eff = self.median()
+        elif self.method == "trend":
+            level, sd, n_eff = self.trend.estimate(remaining)
+            # A falling trend must not extrapolate to frames faster than any seen.
+            level = max(level, self.frame_times.min)
+        else:
+            level, sd, n_eff = self.ewma.estimate(remaining)
+        eta = remaining * level
+        # Frame-to-frame noise averages out over the remaining frames; the
+        # error in the level itself does not, so it scales with remaining.
+        spread = BAND_Z * sd * math.sqrt(remaining + remaining * remaining / max(1.0, n_eff))
+        return eta, max(0.0, eta - spread), eta + spread